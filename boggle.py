@@ -1,20 +1,154 @@
-from typing import Callable, List
+import queue
+import sys
+import threading
+import time
+from typing import Any, Callable, List, Optional, Union
 from boggle_gui import (
-    BoggleGUI, COORDS_TYPE, SUBMIT_BUTTON_COORD,
+    BoggleGUI, COORDS_TYPE,
     WRONG_WORD_BG, RIGHT_WORD_BG, ACTIVE_BUTTON_COLOR
 )
 from boggle_model import BoggleModel
-from boggle_board_randomizer import randomize_board
+from boggle_pregen import BoardPipeline
+from boggle_solver import BoardSolution
+from boggle_board_randomizer import BOARD_SIZE, dice_for_size, randomize_board
+from boggle_timer import TimerWheel
+import boggle_dict_index
+import boggle_metrics
+
+PREGEN_DEPTH = 3  # Number of solved boards kept ready for the next rounds.
+TIMER_TICK_MS = 200  # Timer display refresh period, in milliseconds.
+STARTUP_POLL_MS = 20  # Period of the checks for the loaded first board.
+ERROR_MS = 3000  # Time a fatal error is shown before closing.
+NEXT_BOARD_TIMEOUT_MS = 1000  # Longest wait for a pre-generated board at
+# the end of a round, before rolling one instead.
+LOADING_MESSAGE = "Loading..."
+WELCOME_MESSAGE = "Welcome to Boggle!"
 
 
 class BoggleController:
-    def __init__(self) -> None:
-        board = randomize_board()
-        self._gui = BoggleGUI(board)
-        self._model = BoggleModel(board)
+    _boards: Optional[BoardPipeline]  # None until the startup load is done.
+    _model: Optional[BoggleModel]  # None until the startup load is done.
+    _startup_results: "queue.Queue[Union[BoardSolution, BaseException]]"
+    _startup_times: List[float]  # Seconds from the start to the first
+    # frame, then to the board being playable.
+    _error: Optional[BaseException]  # Why the game failed, e.g. the startup
+    # load.
+
+    def __init__(self, board_size: int = BOARD_SIZE) -> None:
+        self._start_time = time.perf_counter()
+        self._startup_times = []
+        self._error = None
+        self._board_size = board_size
+        # Fails on an unsupported size before any window is drawn
+        self._dice_list = dice_for_size(board_size)
+        self._boards = None
+        self._model = None
+        # The window is drawn right away with an empty board; the dictionary
+        # and the first board's solution are loaded in a worker thread and
+        # handed over to the Tk loop through a queue.
+        self._gui = BoggleGUI([[""] * board_size for _ in range(board_size)])
+        self._gui.set_display_cur(LOADING_MESSAGE)
+        self._round_timers = TimerWheel(resolution=TIMER_TICK_MS / 1000,
+                                        clock=BoggleModel.clock)
+        # Profiles the first round when BOGGLE_PROFILE is set
+        self._profiler = boggle_metrics.round_profiler_from_env()
+        self._startup_results = queue.Queue()
+        main_window = self._gui.get_main_window()
+        main_window.bind("<Map>", self._on_first_frame, add="+")
+        threading.Thread(target=self._load, daemon=True,
+                         name="boggle-startup").start()
+        main_window.after(STARTUP_POLL_MS, self._poll_startup)
+
+    def _load(self) -> None:
+        """
+        Startup worker: opens the dictionary index, starts the board
+        pipeline and waits for its first solved board, then queues the
+        result (or the error) for the Tk loop
+        :return:
+        """
+        try:
+            self._boards = BoardPipeline(
+                boggle_dict_index.get_index(), depth=PREGEN_DEPTH,
+                dice_list=self._dice_list,
+                rows=self._board_size, cols=self._board_size
+            ).start()
+            self._startup_results.put(self._boards.get())
+        except BaseException as error:
+            self._startup_results.put(error)
+
+    def _on_first_frame(self, event: Any) -> None:
+        """
+        Records the time to the first frame, when the window is first
+        mapped on screen
+        :param event: Tk map event
+        :return:
+        """
+        if not self._startup_times:
+            self._record_startup_time("startup.first_frame")
+
+    def _poll_startup(self) -> None:
+        """
+        Checks for the startup worker's result from the Tk loop, and makes
+        the board playable once it is there
+        :return:
+        """
+        try:
+            result = self._startup_results.get_nowait()
+        except queue.Empty:
+            self._gui.get_main_window().after(STARTUP_POLL_MS,
+                                              self._poll_startup)
+            return
+        if isinstance(result, BaseException):
+            self._fail(result)
+            return
+        board = result.get_board()
+        self._model = BoggleModel(board, result)
+        self._gui.reset_gui(board)
+        self._gui.set_display_cur(WELCOME_MESSAGE)
         for button in self._gui.get_buttons_info():
             action = self.create_button_action(button[1])
             self._gui.set_button_command(button[1], action)
+        if not self._startup_times:
+            # Interactive before the map event was seen
+            self._record_startup_time("startup.first_frame")
+        self._record_startup_time("startup.interactive")
+        if boggle_metrics.METRICS.enabled:
+            print("Startup: first frame {0:.3f}s, interactive {1:.3f}s"
+                  .format(*self._startup_times), file=sys.stderr)
+
+    def _fail(self, error: BaseException) -> None:
+        """
+        Ends the game on an error from a Tk callback. Raising there would only
+        be reported by Tk, leaving the window waiting forever: shows the
+        error, closes the window, and lets run raise it
+        :param error: The error
+        :return:
+        """
+        self._error = error
+        self._gui.set_display_cur("Error: {0}".format(error))
+        main_window = self._gui.get_main_window()
+        main_window.after(ERROR_MS, main_window.destroy)
+
+    def _record_startup_time(self, name: str) -> None:
+        """
+        Records the seconds since the controller started, as a startup time
+        and in the metrics
+        :param name: Metric name of the startup step
+        :return:
+        """
+        elapsed = time.perf_counter() - self._start_time
+        self._startup_times.append(elapsed)
+        if boggle_metrics.METRICS.enabled:
+            boggle_metrics.METRICS.observe(name, elapsed)
+
+    def get_startup_times(self) -> List[float]:
+        """
+        Method that returns the startup times measured so far: seconds from
+        the controller start to the first frame, then to the first board
+        being playable
+        :return: list of the times
+        """
+        return list(self._startup_times)
 
     def create_button_action(self, button_cord: COORDS_TYPE
                              ) -> Callable[[], None]:
@@ -32,8 +166,9 @@ class BoggleController:
             """
             if self._model.is_game_stopped():
                 self._model.start_game()
+                self._gui.set_display_used(self._model.get_words_found_list())
                 self._gui.set_buttons_text()
-                self.reduce_time()
+                self.start_round_timer()
             else:
                 current_path: List[COORDS_TYPE] = self._model.get_current_path()
                 is_submit_succeeded = self._model.do_submit()
@@ -41,12 +176,14 @@ class BoggleController:
                     self._gui.set_buttons_color(
                         current_path, RIGHT_WORD_BG, is_submit=True
                     )
+                    self._gui.add_display_used(
+                        self._model.get_last_found_word()
+                    )
                 else:
                     self._gui.set_buttons_color(
                         current_path, WRONG_WORD_BG, is_submit=True
                     )
             self._gui.set_display_cur(self._model.get_display())
-            self._gui.set_display_used(self._model.get_words_found_list())
             self._gui.set_score_display(
                 self._model.get_score(), self._model.current_score_percentage()
             )
@@ -64,7 +201,7 @@ class BoggleController:
                     self._model.get_score(),
                     self._model.current_score_percentage()
                 )
-                self.reduce_time()
+                self.start_round_timer()
             else:
                 _is_success_click = self._model.click(button_cord)
                 if _is_success_click:
@@ -74,22 +211,34 @@ class BoggleController:
                                                 is_submit=False)
             self._gui.set_display_cur(self._model.get_display())
 
-        if button_cord == SUBMIT_BUTTON_COORD:
+        if button_cord == self._gui.get_submit_button_coord():
             return submit_func
         return letter_func
 
-    def reduce_time(self):
+    def start_round_timer(self):
+        """
+        Method that schedules the end of the round that just started, at the
+        model's round deadline, and starts refreshing the timer display
+        :return:
+        """
+        self._round_timers.schedule(self._model.get_deadline(),
+                                    self.reset_game)
+        if self._profiler is not None:
+            self._profiler.start()
+        self.update_time()
+
+    def update_time(self):
         """
-        Method that reduces the time of the game and ends the current round
-        of the game if the time hits 0
+        Method that refreshes the timer display and advances the round
+        timers, which ends the current round of the game once its deadline
+        passes. The remaining time is read from the model's deadline, so it
+        doesn't drift when the refresh runs late
         :return:
         """
         self._gui.set_timer_display(self._model.get_time())
-        if self._model.get_timer() > 0:
-            self._model.reduce_time()
-            self._gui.get_main_window().after(1000, self.reduce_time)
-        else:
-            self.reset_game()
+        self._round_timers.advance()
+        if not self._model.is_game_stopped():
+            self._gui.get_main_window().after(TIMER_TICK_MS, self.update_time)
 
     def reset_game(self):
         """
@@ -98,10 +247,28 @@ class BoggleController:
         if he wants to play again
         :return:
         """
-        board = randomize_board()
+        if self._profiler is not None:
+            print(self._profiler.stop(), file=sys.stderr)
+            self._profiler = None
+
+        try:
+            solution = self._boards.get(
+                timeout=NEXT_BOARD_TIMEOUT_MS / 1000
+            )
+            board = solution.get_board()
+        except queue.Empty:
+            # The pipeline is behind: roll the board here, the model solves
+            # it in the background
+            solution = None
+            board = randomize_board(self._dice_list, self._board_size,
+                                    self._board_size)
+        except Exception as error:
+            # A pipeline worker failed
+            self._fail(error)
+            return
 
         # Reset model
-        self._model.stop_game(board)
+        self._model.stop_game(board, solution)
 
         # Reset gui
         self._gui.reset_gui(board)
@@ -114,9 +281,21 @@ class BoggleController:
         """
         Method that runs the gui of game
         :return:
+        :raises: The error the game failed with (see _fail), e.g. the
+        startup load's, once the window closes
         """
-        self._gui.run()
+        try:
+            self._gui.run()
+        finally:
+            if self._boards is not None:
+                self._boards.stop()
+        if self._error is not None:
+            raise self._error
 
 
 if __name__ == "__main__":
-    BoggleController().run()
+    # Optional board size argument: 4 (default), 5 or 6
+    if len(sys.argv) > 1:
+        BoggleController(int(sys.argv[1])).run()
+    else:
+        BoggleController().run()
@@ -0,0 +1,433 @@
+"""
+Batch solving of many boards across processes.
+Usage:
+    python boggle_batch.py --count 10000 --seed 1 > solved.jsonl
+    python boggle_batch.py --input boards.jsonl --workers 8 -o solved.jsonl
+    python boggle_batch.py --count 100 --min-words 80 --long-word-length 7
+Every output line is a JSON object with the board, its words, max_score and
+word_count. With difficulty constraints, random boards are sampled until
+--count of them meet the constraints, and every line also holds the board's
+compact ID.
+"""
+import argparse
+import collections
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import (
+    Any, Deque, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple,
+    Union
+)
+
+import boggle_board_randomizer
+import boggle_dict_index
+import boggle_solver
+
+RESULT_TYPE = Dict[str, Any]
+
+DEFAULT_CHUNK_SIZE = 64
+
+# Words of the worker process, set once by _init_worker.
+_worker_words: Optional[boggle_solver.WordIndex] = None
+
+
+def _init_worker(index_path: Optional[str],
+                 words: Optional[List[str]]) -> None:
+    """
+    Worker process initializer. Workers map the compiled index file
+    themselves, so the dictionary is never pickled to them; only an in-memory
+    words list is sent, once per worker.
+    :param index_path: Path of a compiled index file, or None.
+    :param words: Words list, used when there is no index file.
+    :return:
+    """
+    global _worker_words
+    if index_path is not None:
+        _worker_words = boggle_dict_index.MappedWordIndex(index_path)
+    else:
+        _worker_words = boggle_solver.WordIndex(words)
+
+
+def solve_result(board: boggle_solver.BOARD_TYPE,
+                 words: Iterable[str]) -> RESULT_TYPE:
+    """
+    Solves a board and returns its JSON-ready result.
+    :param board: Boggle board.
+    :param words: Words iterable or WordIndex.
+    :return: Dictionary of board, words, max_score and word_count.
+    """
+    return _solution_result(boggle_solver.BoardSolution.solve(board, words))
+
+
+def _solution_result(solution: boggle_solver.BoardSolution) -> RESULT_TYPE:
+    """
+    Returns the JSON-ready result of a solved board, see solve_result.
+    :param solution: The board's solution.
+    :return: As described.
+    """
+    return {"board": solution.get_board(),
+            "words": sorted(solution.get_words()),
+            "max_score": solution.max_score(),
+            "word_count": len(solution.get_cells())}
+
+
+def _solve_chunk(boards: List[boggle_solver.BOARD_TYPE]
+                 ) -> List[RESULT_TYPE]:
+    """
+    Solves a chunk of boards in a worker process.
+    :param boards: Boards to solve.
+    :return: Their results, in order.
+    """
+    return [solve_result(board, _worker_words) for board in boards]
+
+
+def _worker_source(words: Union[str, Iterable[str]]
+                   ) -> Tuple[Optional[str], Optional[List[str]]]:
+    """
+    Returns what the worker processes load their words from, see
+    _init_worker.
+    :param words: Words file, MappedWordIndex or words iterable.
+    :return: Tuple of (index path, words list), one of them None.
+    """
+    if isinstance(words, str):
+        return boggle_dict_index.open_index(words).get_path(), None
+    if isinstance(words, boggle_dict_index.MappedWordIndex):
+        return words.get_path(), None
+    return None, list(words)
+
+
+def solve_many(boards: Iterable[boggle_solver.BOARD_TYPE],
+               words: Union[str, Iterable[str]] =
+               boggle_dict_index.DEFAULT_SOURCE,
+               workers: Optional[int] = None,
+               chunk_size: int = DEFAULT_CHUNK_SIZE
+               ) -> Iterator[RESULT_TYPE]:
+    """
+    Solves boards in a pool of worker processes and yields their results in
+    the boards' order as soon as they are ready. Boards are read lazily and
+    only a few chunks per worker are in flight, so the boards iterable may
+    be a generator of any length.
+    :param boards: Boards to solve.
+    :param words: Path of a words file (its compiled index is mapped by the
+    workers), a MappedWordIndex, or any other words iterable.
+    :param workers: Number of worker processes, defaults to the CPU count.
+    :param chunk_size: Boards sent to a worker per task.
+    :return: Iterator of results, see solve_result.
+    """
+    index_path, words_list = _worker_source(words)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    boards_iter = iter(boards)
+    pending: Deque[Future] = collections.deque()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(index_path, words_list)) as executor:
+        while True:
+            while len(pending) < 2 * workers:
+                chunk = list(itertools.islice(boards_iter, chunk_size))
+                if not chunk:
+                    break
+                pending.append(executor.submit(_solve_chunk, chunk))
+            if not pending:
+                return
+            yield from pending.popleft().result()
+
+
+class BoardConstraints:
+    """
+    Difficulty constraints a generated board must meet. Every bound is
+    optional and inclusive.
+    """
+
+    def __init__(self, min_words: Optional[int] = None,
+                 max_words: Optional[int] = None,
+                 min_score: Optional[int] = None,
+                 max_score: Optional[int] = None,
+                 long_word_length: Optional[int] = None,
+                 min_long_words: int = 1):
+        """
+        :param min_words: Fewest words the board may hold.
+        :param max_words: Most words the board may hold.
+        :param min_score: Lowest max score the board may have.
+        :param max_score: Highest max score the board may have.
+        :param long_word_length: Length from which a word is long, None to
+        not require long words.
+        :param min_long_words: Fewest long words the board must hold.
+        """
+        self.min_words = min_words
+        self.max_words = max_words
+        self.min_score = min_score
+        self.max_score = max_score
+        self.long_word_length = long_word_length
+        self.min_long_words = min_long_words
+
+    def matches(self, cells: Dict[str, boggle_solver.CELLS_TYPE]) -> bool:
+        """
+        Checks a solved board against the constraints.
+        :param cells: The board's words and paths, see solve_cells.
+        :return: True/False
+        """
+        if self.min_words is not None and len(cells) < self.min_words:
+            return False
+        if self.max_words is not None and len(cells) > self.max_words:
+            return False
+        if self.min_score is not None or self.max_score is not None:
+            score = sum(len(path) ** 2 for path in cells.values())
+            if self.min_score is not None and score < self.min_score:
+                return False
+            if self.max_score is not None and score > self.max_score:
+                return False
+        if self.long_word_length is not None:
+            long_words = sum(1 for word in cells
+                             if len(word) >= self.long_word_length)
+            if long_words < self.min_long_words:
+                return False
+        return True
+
+
+def _sample_chunk(seed: Optional[str], size: int, count: int,
+                  constraints: BoardConstraints) -> List[RESULT_TYPE]:
+    """
+    Rolls and solves a chunk of boards in a worker process, keeping the
+    ones that meet the constraints. Only the accepted boards are turned into
+    full results.
+    :param seed: Seed of the chunk's boards, None for random ones.
+    :param size: Number of rows (and columns) of every board.
+    :param count: Number of boards to roll.
+    :param constraints: The constraints.
+    :return: Results of the accepted boards (see solve_result), each with
+    the board's compact ID under "id".
+    """
+    generator = boggle_board_randomizer.BoardGenerator(
+        seed, boggle_board_randomizer.dice_for_size(size), size, size
+    )
+    packed = generator.roll_packed(count)
+    cell_count = generator.get_cell_count()
+    accepted = []
+    for i in range(count):
+        board = generator.unpack(packed, i)
+        cells = boggle_solver.solve_cells(boggle_solver.BoardGraph(board),
+                                          _worker_words)
+        if constraints.matches(cells):
+            result = _solution_result(
+                boggle_solver.BoardSolution(board, cells)
+            )
+            result["id"] = boggle_board_randomizer.encode_board_id(
+                packed[i * cell_count:(i + 1) * cell_count]
+            )
+            accepted.append(result)
+    return accepted
+
+
+def find_boards(constraints: BoardConstraints, count: int,
+                words: Union[str, Iterable[str]] =
+                boggle_dict_index.DEFAULT_SOURCE,
+                seed: Optional[int] = None,
+                size: int = boggle_board_randomizer.BOARD_SIZE,
+                workers: Optional[int] = None,
+                chunk_size: int = DEFAULT_CHUNK_SIZE,
+                max_samples: Optional[int] = None,
+                stats: Optional[Dict[str, Union[int, float]]] = None
+                ) -> Iterator[RESULT_TYPE]:
+    """
+    Generates boards meeting difficulty constraints by rejection sampling:
+    worker processes roll and solve chunks of random boards and send back
+    the ones that match. With a seed, the same arguments always give the
+    same boards.
+    :param constraints: The constraints.
+    :param count: Number of boards to find.
+    :param words: Words file, MappedWordIndex or words iterable, see
+    solve_many.
+    :param seed: Random seed, None for random boards.
+    :param size: Number of rows (and columns) of every board.
+    :param workers: Number of worker processes, defaults to the CPU count.
+    :param chunk_size: Boards rolled by a worker per task. The last chunk
+    is smaller when max_samples is not a multiple of it.
+    :param max_samples: Gives up after rolling that many boards, None to
+    never give up.
+    :param stats: If given, kept up to date with sampled boards, matched
+    boards (sampled boards meeting the constraints, including the ones a
+    chunk found beyond count), accepted boards (yielded), acceptance_rate
+    (matched / sampled), seconds and seconds_per_accepted (seconds per
+    matched board).
+    :return: Iterator of results, see _sample_chunk.
+    """
+    index_path, words_list = _worker_source(words)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if stats is None:
+        stats = {}
+    stats.update(sampled=0, matched=0, accepted=0, acceptance_rate=0.0,
+                 seconds=0.0, seconds_per_accepted=0.0)
+    start = time.perf_counter()
+    chunks = itertools.count()
+    pending: Deque[Tuple[Future, int]] = collections.deque()  # Tasks and
+    # their number of boards.
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(index_path, words_list)) as executor:
+        try:
+            while stats["accepted"] < count:
+                while len(pending) < 2 * workers:
+                    boards = chunk_size
+                    if max_samples is not None:
+                        # Boards left to roll, past the chunks in flight.
+                        boards = min(boards, max_samples - stats["sampled"]
+                                     - sum(n for _, n in pending))
+                        if boards <= 0:
+                            break
+                    chunk_seed = (None if seed is None
+                                  else "{0}-{1}".format(seed, next(chunks)))
+                    pending.append((executor.submit(
+                        _sample_chunk, chunk_seed, size, boards, constraints
+                    ), boards))
+                if not pending:
+                    return
+                future, boards = pending.popleft()
+                accepted = future.result()
+                stats["sampled"] += boards
+                stats["matched"] += len(accepted)
+                stats["seconds"] = time.perf_counter() - start
+                stats["acceptance_rate"] = (stats["matched"]
+                                            / stats["sampled"])
+                if stats["matched"]:
+                    stats["seconds_per_accepted"] = (stats["seconds"]
+                                                     / stats["matched"])
+                for result in accepted[:count - stats["accepted"]]:
+                    stats["accepted"] += 1
+                    yield result
+        finally:
+            for future, _ in pending:
+                future.cancel()
+
+
+def _read_boards(file_obj: TextIO) -> Iterator[boggle_solver.BOARD_TYPE]:
+    """
+    Reads boards from a JSONL file, one board (list of rows) per line.
+    :param file_obj: Opened file.
+    :return: Iterator of boards.
+    """
+    for line in file_obj:
+        if line.strip():
+            yield json.loads(line)
+
+
+def _random_boards(count: int, seed: Optional[int],
+                   size: int = boggle_board_randomizer.BOARD_SIZE
+                   ) -> Iterator[boggle_solver.BOARD_TYPE]:
+    """
+    Generates random boards.
+    :param count: Number of boards.
+    :param seed: Random seed, None for an unseeded generator.
+    :param size: Number of rows (and columns) of every board.
+    :return: Iterator of boards.
+    """
+    generator = boggle_board_randomizer.BoardGenerator(
+        seed, boggle_board_randomizer.dice_for_size(size), size, size
+    )
+    for _ in range(count):
+        yield generator.roll()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Solve many boggle boards, writing JSONL results."
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", help="JSONL file of boards, - for stdin")
+    source.add_argument("--count", type=int,
+                        help="Number of random boards to solve")
+    parser.add_argument("--seed", type=int, help="Seed for random boards")
+    parser.add_argument("--size", type=int,
+                        default=boggle_board_randomizer.BOARD_SIZE,
+                        help="Size of random boards (4, 5 or 6)")
+    parser.add_argument("--dict", default=boggle_dict_index.DEFAULT_SOURCE,
+                        help="Words file")
+    parser.add_argument("--workers", type=int, help="Worker processes")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("-o", "--output", help="Output file, default stdout")
+    difficulty = parser.add_argument_group(
+        "difficulty", "Keep only random boards meeting these constraints; "
+                      "--count is then the number of boards kept"
+    )
+    difficulty.add_argument("--min-words", type=int)
+    difficulty.add_argument("--max-words", type=int)
+    difficulty.add_argument("--min-score", type=int)
+    difficulty.add_argument("--max-score", type=int)
+    difficulty.add_argument("--long-word-length", type=int,
+                            help="Length from which a word is long")
+    difficulty.add_argument("--min-long-words", type=int, default=1,
+                            help="Long words a board must hold")
+    difficulty.add_argument("--max-samples", type=int,
+                            help="Give up after rolling that many boards")
+    args = parser.parse_args(argv)
+
+    constraints = BoardConstraints(args.min_words, args.max_words,
+                                   args.min_score, args.max_score,
+                                   args.long_word_length, args.min_long_words)
+    if args.count is not None and any(
+            bound is not None for bound in
+            (args.min_words, args.max_words, args.min_score, args.max_score,
+             args.long_word_length)
+    ):
+        _main_find(args, constraints)
+        return
+
+    if args.input is None:
+        boards = _random_boards(args.count, args.seed, args.size)
+        input_obj = None
+    elif args.input == "-":
+        input_obj = sys.stdin
+        boards = _read_boards(input_obj)
+    else:
+        input_obj = open(args.input)
+        boards = _read_boards(input_obj)
+    output_obj = sys.stdout if args.output is None else open(args.output, "w")
+
+    start = time.perf_counter()
+    solved = 0
+    try:
+        for result in solve_many(boards, args.dict, args.workers,
+                                 args.chunk_size):
+            output_obj.write(json.dumps(result) + "\n")
+            solved += 1
+    finally:
+        if input_obj not in (None, sys.stdin):
+            input_obj.close()
+        if output_obj is not sys.stdout:
+            output_obj.close()
+    elapsed = time.perf_counter() - start
+    print("Solved {0} boards in {1:.2f}s ({2:.1f} boards/s)".format(
+        solved, elapsed, solved / elapsed if elapsed else 0.0
+    ), file=sys.stderr)
+
+
+def _main_find(args: argparse.Namespace,
+               constraints: BoardConstraints) -> None:
+    """
+    Difficulty mode of main: writes boards meeting the constraints.
+    :param args: Parsed command line.
+    :param constraints: The constraints.
+    :return:
+    """
+    output_obj = sys.stdout if args.output is None else open(args.output, "w")
+    stats: Dict[str, Union[int, float]] = {}
+    try:
+        for result in find_boards(constraints, args.count, args.dict,
+                                  args.seed, args.size, args.workers,
+                                  args.chunk_size, args.max_samples, stats):
+            output_obj.write(json.dumps(result) + "\n")
+    finally:
+        if output_obj is not sys.stdout:
+            output_obj.close()
+    print("Wrote {0} boards; {1} of {2} sampled boards matched ({3:.2%}) "
+          "in {4:.2f}s ({5:.1f} ms per matching board)".format(
+              stats["accepted"], stats["matched"], stats["sampled"],
+              stats["acceptance_rate"], stats["seconds"],
+              stats["seconds_per_accepted"] * 1000
+          ), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+"""
+Benchmark suite for the solvers of boggle_utils and the model lifecycle.
+Usage:
+    python boggle_bench.py --save baseline.json
+    python boggle_bench.py --compare baseline.json --threshold 0.3
+Every case is timed on seeded random boards and on adversarial boards (a board
+of a single letter, a board crowded with QU). Solving cases solve from
+scratch on every call: searches keep no memo from one call to the next, so a
+case's time doesn't depend on the cases run before it. Results are saved as
+a JSON baseline; compare mode flags the cases that got slower than the
+baseline by more than the threshold, times them again to rule out noise, and
+exits with status 1 if any is still slower. Cases are compared by their time
+relative to a fixed reference workload timed right before every run, which
+cancels out the machine running slower for a while (a shared or throttled
+CPU can vary by 2x over tens of seconds).
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import timeit
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import boggle_board_randomizer
+import boggle_dict_index
+import boggle_prefilter
+import boggle_solver
+import boggle_utils
+from boggle_model import BoggleModel
+
+BASELINE_VERSION = 2
+DEFAULT_REPEAT = 7
+DEFAULT_BOARDS = 3
+DEFAULT_SEED = 1
+# Fraction of slowdown reported as a regression. Back-to-back runs of the
+# same code differ by up to about 25% on a busy single core machine.
+DEFAULT_THRESHOLD = 0.3
+MIN_RUN_TIME = 0.2  # Seconds a timed run lasts at least, see _time_case.
+# Size of the reference workload timed next to every run, see _time_case.
+REFERENCE_SIZE = 20000
+# Times a case flagged as a regression is timed again; it is reported only if
+# every retry is still slower than the threshold. Noise rarely lasts that long.
+DEFAULT_RETRIES = 2
+FIND_LENGTHS = (3, 6)  # Path lengths the find_length_n_* cases run with.
+
+CASE_TYPE = Tuple[str, Callable[[], Any]]
+RESULT_TYPE = Dict[str, Any]
+
+
+def _adversarial_boards(size: int
+                        ) -> List[Tuple[str, boggle_solver.BOARD_TYPE]]:
+    """
+    Returns the named adversarial boards of a size: every cell E (the most
+    paths hold a dictionary prefix), and QU on every other cell with common
+    letters between them (every QU cell spells two letters).
+    :param size: Number of rows (and columns).
+    :return: List of (name, board).
+    """
+    all_e = [["E"] * size for _ in range(size)]
+    letters = "IETASRN"
+    qu_heavy = [["QU" if (row + col) % 2 == 0
+                 else letters[(row * size + col) // 2 % len(letters)]
+                 for col in range(size)] for row in range(size)]
+    return [("all-e-{0}x{0}".format(size), all_e),
+            ("qu-heavy-{0}x{0}".format(size), qu_heavy)]
+
+
+def bench_boards(count: int = DEFAULT_BOARDS, seed: int = DEFAULT_SEED,
+                 size: int = boggle_board_randomizer.BOARD_SIZE
+                 ) -> List[Tuple[str, boggle_solver.BOARD_TYPE]]:
+    """
+    Returns the named boards the suite runs on: seeded random boards, then
+    the adversarial boards. The same arguments always give the same boards.
+    :param count: Number of random boards.
+    :param seed: Seed of the random boards.
+    :param size: Number of rows (and columns) of every board.
+    :return: List of (name, board).
+    """
+    generator = boggle_board_randomizer.BoardGenerator(
+        seed, boggle_board_randomizer.dice_for_size(size), size, size
+    )
+    boards = [("random-{0}x{0}-{1}".format(size, i), generator.roll())
+              for i in range(count)]
+    return boards + _adversarial_boards(size)
+
+
+def _submit_all(solution: boggle_solver.BoardSolution,
+                words: boggle_solver.WordIndex,
+                paths: List[boggle_utils.PATH_TYPE]) -> int:
+    """
+    Plays a round submitting every path, on a model built with the solution
+    so that only the submissions are timed.
+    :param solution: Solution of the board.
+    :param words: Dictionary index the board was solved with.
+    :param paths: Paths to submit.
+    :return: The round's score.
+    """
+    model = BoggleModel(solution.get_board(), solution, words_index=words)
+    model.start_game()
+    for path in paths:
+        model.submit_path(path)
+    return model.get_score()
+
+
+def _init_and_solve(board: boggle_solver.BOARD_TYPE,
+                    words: boggle_solver.WordIndex) -> int:
+    """
+    Builds a model the way a new round does and waits for its board to be
+    solved in the background.
+    :param board: Board of the round.
+    :param words: Dictionary index.
+    :return: The board's max score.
+    """
+    return BoggleModel(board, words_index=words).max_score()
+
+
+def iter_cases(boards: List[Tuple[str, boggle_solver.BOARD_TYPE]],
+               dict_path: str = boggle_dict_index.DEFAULT_SOURCE
+               ) -> Iterator[CASE_TYPE]:
+    """
+    Yields the benchmark cases, each a name and a function to time.
+    :param boards: Named boards, see bench_boards.
+    :param dict_path: Words file.
+    :return: Iterator of (name, function).
+    """
+    yield "load_words_list", lambda: boggle_utils.load_words_list(dict_path)
+    words = boggle_dict_index.get_index(dict_path)
+    word_filter = boggle_prefilter.WordFilter(words)
+    for name, board in boards:
+        solution = boggle_solver.BoardSolution.solve(board, words)
+        paths = solution.get_paths()
+        # Hits first, then the same paths reversed, mostly misses.
+        submissions = list(paths.values())
+        submissions += [path[::-1] for path in submissions]
+        # The longest word of the board, or a word the board can't hold.
+        word = max(paths, key=len, default="E" * 7 + "X")
+        yield ("max_score_paths/" + name,
+               lambda b=board: boggle_utils.max_score_paths(b, words))
+        yield ("prefilter+max_score_paths/" + name,
+               lambda b=board: boggle_utils.max_score_paths(
+                   b, word_filter.candidates(b)
+               ))
+        for n in FIND_LENGTHS:
+            yield ("find_length_n_paths/{0}/n={1}".format(name, n),
+                   lambda b=board, n=n:
+                   boggle_utils.find_length_n_paths(n, b, words))
+            yield ("find_length_n_words/{0}/n={1}".format(name, n),
+                   lambda b=board, n=n:
+                   boggle_utils.find_length_n_words(n, b, words))
+        yield ("find_n_length_path_for_word/" + name,
+               lambda b=board, w=word:
+               boggle_utils.find_n_length_path_for_word(b, w, len(w)))
+        yield ("BoggleModel.__init__/" + name,
+               lambda b=board: _init_and_solve(b, words))
+        yield ("do_submit/" + name,
+               lambda s=solution, p=submissions: _submit_all(s, words, p))
+
+
+def _reference_work() -> List[str]:
+    """
+    Fixed interpreter bound workload (dict inserts, string formatting and a
+    sort) measuring the current speed of the machine.
+    :return: The sorted keys.
+    """
+    table = {}
+    for i in range(REFERENCE_SIZE):
+        table[str(i)] = i
+    return sorted(table)
+
+
+def _time_case(func: Callable[[], Any], repeat: int) -> RESULT_TYPE:
+    """
+    Times a function: every run calls it enough times to last MIN_RUN_TIME,
+    and the fastest run is the least disturbed by the rest of the machine.
+    The reference workload is timed right before every run.
+    :param func: Function to time.
+    :param repeat: Number of runs.
+    :return: Dictionary of best, median (seconds per call), relative (median
+    over the runs of the time per call over the reference time before the
+    run: unlike the best, robust to a reference timed in a slow moment),
+    calls (per run) and runs.
+    """
+    timer = timeit.Timer(func)
+    calls = 1
+    while True:
+        elapsed = timer.timeit(calls)
+        if elapsed >= MIN_RUN_TIME:
+            break
+        calls *= 2 if elapsed * 10 >= MIN_RUN_TIME else 10
+    runs = []
+    relative = []
+    for _ in range(repeat):
+        reference = min(timeit.repeat(_reference_work, number=1, repeat=3))
+        seconds = timer.timeit(calls) / calls
+        runs.append(seconds)
+        relative.append(seconds / reference)
+    runs.sort()
+    relative.sort()
+    return {"best": runs[0], "median": runs[len(runs) // 2],
+            "relative": relative[len(relative) // 2], "calls": calls,
+            "runs": repeat}
+
+
+def run_suite(boards: List[Tuple[str, boggle_solver.BOARD_TYPE]],
+              repeat: int = DEFAULT_REPEAT, only: Optional[str] = None,
+              dict_path: str = boggle_dict_index.DEFAULT_SOURCE,
+              verbose: bool = False) -> Dict[str, Any]:
+    """
+    Runs the benchmark cases.
+    :param boards: Named boards, see bench_boards.
+    :param repeat: Timed runs per case.
+    :param only: Runs only the cases whose name contains it.
+    :param dict_path: Words file.
+    :param verbose: Prints every result to stderr as it comes.
+    :return: Baseline dictionary: version, meta and results (case name to
+    its timing, see _time_case).
+    """
+    results = {}
+    for name, func in iter_cases(boards, dict_path):
+        if only is not None and only not in name:
+            continue
+        results[name] = _time_case(func, repeat)
+        if verbose:
+            print("{0:<60} {1:10.3f} ms".format(
+                name, results[name]["best"] * 1000
+            ), file=sys.stderr)
+    return {"version": BASELINE_VERSION,
+            "meta": {"python": platform.python_version(),
+                     "platform": platform.platform(),
+                     "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                     "boards": dict(boards)},
+            "results": results}
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any],
+            threshold: float = DEFAULT_THRESHOLD) -> List[RESULT_TYPE]:
+    """
+    Compares two suite runs case by case, by their times relative to the
+    reference workload (best times for baselines that have none).
+    :param baseline: Baseline, see run_suite.
+    :param current: Run to check against the baseline.
+    :param threshold: Slowdown fraction above which a case regressed, e.g.
+    0.2 flags cases more than 20% slower.
+    :return: For every case of both runs: name, baseline and current best
+    time, ratio (current / baseline, relative times) and status
+    (regression, improvement, ok, new or missing).
+    """
+    rows = []
+    old, new = baseline["results"], current["results"]
+    for name in list(old) + [name for name in new if name not in old]:
+        row = {"name": name,
+               "baseline": old[name]["best"] if name in old else None,
+               "current": new[name]["best"] if name in new else None,
+               "ratio": None}
+        if row["baseline"] is None:
+            row["status"] = "new"
+        elif row["current"] is None:
+            row["status"] = "missing"
+        else:
+            if "relative" in old[name] and "relative" in new[name]:
+                row["ratio"] = new[name]["relative"] / old[name]["relative"]
+            else:
+                row["ratio"] = row["current"] / row["baseline"]
+            if row["ratio"] > 1 + threshold:
+                row["status"] = "regression"
+            elif row["ratio"] < 1 / (1 + threshold):
+                row["status"] = "improvement"
+            else:
+                row["status"] = "ok"
+        rows.append(row)
+    return rows
+
+
+def confirm_regressions(baseline: Dict[str, Any], current: Dict[str, Any],
+                        boards: List[Tuple[str, boggle_solver.BOARD_TYPE]],
+                        threshold: float = DEFAULT_THRESHOLD,
+                        repeat: int = DEFAULT_REPEAT,
+                        retries: int = DEFAULT_RETRIES,
+                        dict_path: str = boggle_dict_index.DEFAULT_SOURCE
+                        ) -> List[RESULT_TYPE]:
+    """
+    Compares two suite runs (see compare), timing the cases that regressed
+    again: a case keeps its fastest timing over the runs, so a slowdown
+    caused by the rest of the machine during one run goes away.
+    :param baseline: Baseline, see run_suite.
+    :param current: Run to check, updated with the new timings.
+    :param boards: Named boards the run was made on, see bench_boards.
+    :param threshold: See compare.
+    :param repeat: Timed runs per case.
+    :param retries: Most times a regressed case is timed again.
+    :param dict_path: Words file.
+    :return: See compare.
+    """
+    rows = compare(baseline, current, threshold)
+    for _ in range(retries):
+        regressed = {row["name"] for row in rows
+                     if row["status"] == "regression"}
+        if not regressed:
+            break
+        for name, func in iter_cases(boards, dict_path):
+            if name in regressed:
+                result = _time_case(func, repeat)
+                if result["relative"] < current["results"][name]["relative"]:
+                    current["results"][name] = result
+        rows = compare(baseline, current, threshold)
+    return rows
+
+
+def _format_ms(seconds: Optional[float]) -> str:
+    return "-" if seconds is None else "{0:.3f}".format(seconds * 1000)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the boggle solvers and model lifecycle."
+    )
+    parser.add_argument("--save", help="Write the results as a baseline")
+    parser.add_argument("--compare", help="Baseline to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Slowdown fraction flagged as a regression")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
+                        help="Times a regressed case is timed again")
+    parser.add_argument("--boards", type=int, default=DEFAULT_BOARDS,
+                        help="Number of random boards")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--size", type=int,
+                        default=boggle_board_randomizer.BOARD_SIZE)
+    parser.add_argument("--only", help="Run the cases containing this text")
+    parser.add_argument("--dict", default=boggle_dict_index.DEFAULT_SOURCE,
+                        help="Words file")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare is not None:
+        with open(args.compare) as file_obj:
+            baseline = json.load(file_obj)
+    boards = bench_boards(args.boards, args.seed, args.size)
+    current = run_suite(boards, args.repeat, args.only, args.dict,
+                        verbose=baseline is None)
+    rows = []
+    if baseline is not None:
+        rows = confirm_regressions(baseline, current, boards, args.threshold,
+                                   args.repeat, args.retries, args.dict)
+    if args.save is not None:
+        with open(args.save, "w") as file_obj:
+            json.dump(current, file_obj, indent=2)
+    if baseline is None:
+        return 0
+
+    print("{0:<60} {1:>10} {2:>10} {3:>7}  {4}".format(
+        "case", "base ms", "now ms", "ratio", "status"
+    ))
+    for row in rows:
+        print("{0:<60} {1:>10} {2:>10} {3:>7}  {4}".format(
+            row["name"], _format_ms(row["baseline"]),
+            _format_ms(row["current"]),
+            "-" if row["ratio"] is None else "{0:.2f}".format(row["ratio"]),
+            row["status"]
+        ))
+    regressions = sum(1 for row in rows if row["status"] == "regression")
+    print("{0} regression(s) above {1:.0%}".format(regressions,
+                                                    args.threshold))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,5 @@
+import base64
+import operator
 import random
 
 BOARD_SIZE = 4
@@ -20,20 +22,273 @@ LETTERS = [
     ['N', 'U', 'I', 'H', 'M', 'QU']
 ]
 
+# Big Boggle, 5x5
+BIG_LETTERS = [
+    ['A', 'A', 'A', 'F', 'R', 'S'],
+    ['A', 'A', 'E', 'E', 'E', 'E'],
+    ['A', 'A', 'F', 'I', 'R', 'S'],
+    ['A', 'D', 'E', 'N', 'N', 'N'],
+    ['A', 'E', 'E', 'E', 'E', 'M'],
+    ['A', 'E', 'E', 'G', 'M', 'U'],
+    ['A', 'E', 'G', 'M', 'N', 'N'],
+    ['A', 'F', 'I', 'R', 'S', 'Y'],
+    ['B', 'J', 'K', 'QU', 'X', 'Z'],
+    ['C', 'C', 'N', 'S', 'T', 'W'],
+    ['C', 'E', 'I', 'I', 'L', 'T'],
+    ['C', 'E', 'I', 'L', 'P', 'T'],
+    ['C', 'E', 'I', 'P', 'S', 'T'],
+    ['D', 'H', 'H', 'N', 'O', 'T'],
+    ['D', 'H', 'H', 'L', 'O', 'R'],
+    ['D', 'H', 'L', 'N', 'O', 'R'],
+    ['D', 'D', 'L', 'N', 'O', 'R'],
+    ['E', 'I', 'I', 'I', 'T', 'T'],
+    ['E', 'M', 'O', 'T', 'T', 'T'],
+    ['E', 'N', 'S', 'S', 'S', 'U'],
+    ['F', 'I', 'P', 'R', 'S', 'Y'],
+    ['G', 'O', 'R', 'R', 'V', 'W'],
+    ['H', 'I', 'P', 'R', 'R', 'Y'],
+    ['N', 'O', 'O', 'T', 'U', 'W'],
+    ['O', 'O', 'O', 'T', 'T', 'U']
+]
+
+# Super Big Boggle, 6x6
+SUPER_BIG_LETTERS = [
+    ['A', 'A', 'A', 'F', 'R', 'S'],
+    ['A', 'A', 'E', 'E', 'E', 'E'],
+    ['A', 'A', 'E', 'E', 'O', 'O'],
+    ['A', 'A', 'F', 'I', 'R', 'S'],
+    ['A', 'B', 'D', 'E', 'I', 'O'],
+    ['A', 'D', 'E', 'N', 'N', 'N'],
+    ['A', 'E', 'E', 'E', 'E', 'M'],
+    ['A', 'E', 'E', 'G', 'M', 'U'],
+    ['A', 'E', 'G', 'M', 'N', 'N'],
+    ['A', 'E', 'I', 'L', 'M', 'N'],
+    ['A', 'E', 'I', 'N', 'O', 'U'],
+    ['A', 'F', 'I', 'R', 'S', 'Y'],
+    ['AN', 'ER', 'HE', 'IN', 'QU', 'TH'],
+    ['B', 'B', 'J', 'K', 'X', 'Z'],
+    ['C', 'C', 'E', 'N', 'S', 'T'],
+    ['C', 'D', 'D', 'L', 'N', 'N'],
+    ['C', 'E', 'I', 'I', 'T', 'T'],
+    ['C', 'E', 'I', 'P', 'S', 'T'],
+    ['C', 'F', 'G', 'N', 'U', 'Y'],
+    ['D', 'D', 'H', 'N', 'O', 'T'],
+    ['D', 'H', 'H', 'L', 'O', 'R'],
+    ['D', 'H', 'H', 'N', 'O', 'W'],
+    ['D', 'H', 'L', 'N', 'O', 'R'],
+    ['E', 'H', 'I', 'L', 'R', 'S'],
+    ['E', 'I', 'I', 'L', 'S', 'T'],
+    ['E', 'I', 'L', 'P', 'S', 'T'],
+    ['E', 'I', 'O', 'E', 'I', 'O'],
+    ['E', 'M', 'T', 'T', 'T', 'O'],
+    ['E', 'N', 'S', 'S', 'S', 'U'],
+    ['G', 'O', 'R', 'R', 'V', 'W'],
+    ['H', 'I', 'R', 'S', 'T', 'V'],
+    ['H', 'O', 'P', 'R', 'S', 'T'],
+    ['I', 'P', 'R', 'S', 'Y', 'Y'],
+    ['J', 'K', 'QU', 'W', 'X', 'Z'],
+    ['N', 'O', 'O', 'T', 'U', 'W'],
+    ['O', 'O', 'O', 'T', 'T', 'U']
+]
+
+# Dice set of every supported (square) board size
+DICE_BY_SIZE = {
+    BOARD_SIZE: LETTERS,
+    5: BIG_LETTERS,
+    6: SUPER_BIG_LETTERS
+}
+
+
+def dice_for_size(size):
+    """
+    Returns the dice set of a size x size board.
+    :param size: Number of rows (and columns) of the board.
+    :return: List of dice, each a list of its faces.
+    """
+    try:
+        return DICE_BY_SIZE[size]
+    except KeyError:
+        raise ValueError("Unsupported board size: {0}".format(size))
 
-def randomize_board(dice_list=LETTERS):
+
+def randomize_board(dice_list=LETTERS, rows=None, cols=None, rng=random):
+    """
+    Rolls a board, placing every die of the set at most once.
+    :param dice_list: Dice to roll, each a list of its faces.
+    :param rows: Number of board rows, defaults to the largest square board
+    the dice fill.
+    :param cols: Number of board columns, defaults to rows.
+    :param rng: Random generator to roll with, e.g. a seeded random.Random,
+    defaults to the random module.
+    :return: The board, a list of rows of faces.
+    """
+    rows, cols = _board_shape(dice_list, rows, cols)
     dice_indices = list(range(len(dice_list)))
-    random.shuffle(dice_indices)
-    dice_indices_iter = iter(dice_indices)
-    board = []
-    for i in range(BOARD_SIZE):
-        row = []
-        for j in range(BOARD_SIZE):
-            die = dice_list[next(dice_indices_iter)]
-            letter = random.choice(die)
-            row.append(letter)
-        board.append(row)
-    return board
+    rng.shuffle(dice_indices)
+    faces = [rng.choice(dice_list[die]) for die in dice_indices]
+    return [faces[row * cols:(row + 1) * cols] for row in range(rows)]
+
+
+def _board_shape(dice_list, rows, cols):
+    """
+    Resolves the default board shape of randomize_board and checks the dice
+    fill it.
+    :param dice_list: Dice to roll.
+    :param rows: Number of board rows, or None.
+    :param cols: Number of board columns, or None.
+    :return: Tuple of (rows, cols).
+    """
+    if rows is None:
+        rows = int(len(dice_list) ** 0.5)
+    if cols is None:
+        cols = rows
+    if rows * cols > len(dice_list):
+        raise ValueError("{0} dice can't fill a {1}x{2} board".format(
+            len(dice_list), rows, cols
+        ))
+    return rows, cols
+
+
+class BoardGenerator:
+    """
+    Seeded board generator. The same seed always rolls the same boards, so a
+    board can be replayed, or dealt to many players, from its seed and
+    position alone.
+    Boards are rolled in a packed format: one byte per cell, in row order,
+    holding die index * faces per die + face index. Packed boards can be
+    turned into compact IDs (see encode_board_id) and back into boards.
+    """
+
+    def __init__(self, seed=None, dice_list=LETTERS, rows=None, cols=None):
+        """
+        :param seed: Random seed, None for an unpredictable one.
+        :param dice_list: Dice to roll, all with the same number of faces.
+        :param rows: Number of board rows, see randomize_board.
+        :param cols: Number of board columns, see randomize_board.
+        """
+        self._rows, self._cols = _board_shape(dice_list, rows, cols)
+        self._faces = len(dice_list[0])
+        if any(len(die) != self._faces for die in dice_list):
+            raise ValueError("All dice must have the same number of faces.")
+        if len(dice_list) * self._faces > 256:
+            raise ValueError("Too many dice faces for the packed format.")
+        self._dice_list = dice_list
+        self._seed = seed
+        self._rng = random.Random(seed)
+        # Packed code of the first face of every die.
+        self._die_codes = [die * self._faces for die in range(len(dice_list))]
+        # Random bytes below _face_limit map evenly onto the faces, the
+        # others are dropped.
+        self._face_limit = 256 - 256 % self._faces
+        self._face_table = bytes(i % self._faces for i in range(256))
+        self._face_drop = bytes(range(self._face_limit, 256))
+
+    def get_seed(self):
+        """
+        Getter method for the generator's seed.
+        :return:
+        """
+        return self._seed
+
+    def get_cell_count(self):
+        """
+        Returns the number of cells of a board, i.e. bytes of a packed board.
+        :return:
+        """
+        return self._rows * self._cols
+
+    def _roll_faces(self, count):
+        """
+        Rolls face indices in bulk: random bytes are reduced modulo the
+        number of faces by a translation table, dropping the bytes that
+        would bias the result.
+        :param count: Number of faces to roll.
+        :return: Bytes of face indices.
+        """
+        faces = b""
+        while len(faces) < count:
+            missing = count - len(faces)
+            faces += self._rng.randbytes(missing + missing // 8 + 8).translate(
+                self._face_table, self._face_drop
+            )
+        return faces[:count]
+
+    def roll_packed(self, count=1):
+        """
+        Rolls boards in the packed format.
+        :param count: Number of boards.
+        :return: The packed boards, concatenated.
+        """
+        cells = self.get_cell_count()
+        die_codes = self._die_codes
+        shuffle = self._rng.shuffle
+        faces = self._roll_faces(count * cells)
+        packed = bytearray(count * cells)
+        for start in range(0, count * cells, cells):
+            shuffle(die_codes)
+            packed[start:start + cells] = map(
+                operator.add, die_codes, faces[start:start + cells]
+            )
+        return bytes(packed)
+
+    def roll(self):
+        """
+        Rolls a board.
+        :return: The board, a list of rows of faces.
+        """
+        return self.unpack(self.roll_packed())
+
+    def unpack(self, packed, index=0):
+        """
+        Returns a board of packed boards rolled by a generator with the same
+        dice and shape.
+        :param packed: Packed boards, see roll_packed.
+        :param index: Position of the board in packed.
+        :return: The board, a list of rows of faces.
+        """
+        cells = self.get_cell_count()
+        codes = packed[index * cells:(index + 1) * cells]
+        if len(codes) != cells:
+            raise ValueError("No packed board at index {0}".format(index))
+        if max(codes) >= len(self._dice_list) * self._faces:
+            raise ValueError("Packed board holds an unknown face.")
+        faces = [self._dice_list[code // self._faces][code % self._faces]
+                 for code in codes]
+        return [faces[row * self._cols:(row + 1) * self._cols]
+                for row in range(self._rows)]
+
+
+def encode_board_id(packed):
+    """
+    Returns the compact ID of a packed board, a URL safe string.
+    :param packed: One packed board, see BoardGenerator.roll_packed.
+    :return: The ID.
+    """
+    return base64.urlsafe_b64encode(packed).rstrip(b"=").decode("ascii")
+
+
+def decode_board_id(board_id, dice_list=None):
+    """
+    Returns the board of a compact ID.
+    :param board_id: ID, see encode_board_id.
+    :param dice_list: Dice the board was rolled with, defaults to the dice
+    set of the square board size the ID holds (see dice_for_size).
+    :return: The board, a list of rows of faces.
+    """
+    try:
+        packed = base64.urlsafe_b64decode(
+            board_id + "=" * (-len(board_id) % 4)
+        )
+    except ValueError:
+        raise ValueError("Invalid board ID: {0}".format(board_id))
+    size = int(len(packed) ** 0.5)
+    if not packed or size * size != len(packed):
+        raise ValueError("Invalid board ID: {0}".format(board_id))
+    if dice_list is None:
+        dice_list = dice_for_size(size)
+    return BoardGenerator(dice_list=dice_list, rows=size,
+                          cols=size).unpack(packed)
+
 
 if __name__=="__main__":
     from pprint import pprint
@@ -0,0 +1,403 @@
+"""
+Compiled dictionary index.
+The words text file is compiled once into a sorted string table that is
+opened with mmap, so exact-word and prefix queries run directly on the mapped
+bytes instead of on a set of str objects built in every process.
+Every version of the words file is compiled to its own index file, named
+after the file's mtime and size, so an edited words file is never compiled
+over an index that processes still have mapped (Windows can't replace a
+mapped file).
+
+Index file layout (all integers little endian):
+    magic         8 bytes
+    count         uint32, number of words
+    source_mtime  int64, st_mtime_ns of the source file when compiled
+    source_size   int64, st_size of the source file when compiled
+    offsets       (count + 1) uint32, start of each word in the file, the
+                  last one being the end of the file
+    blob          the sorted words, ASCII, concatenated
+"""
+import bisect
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import time
+from typing import (
+    Dict, Iterator, Optional, Sequence, Tuple, Union, overload
+)
+
+import boggle_metrics
+import boggle_solver
+
+INDEX_MAGIC = b"BGLIDX02"
+INDEX_SUFFIX = ".idx"
+DEFAULT_SOURCE = "boggle_dict.txt"
+
+_HEADER = struct.Struct("<8sIqq")
+_OFFSET_SIZE = 4
+# Sorts after any ASCII byte, see boggle_solver._HIGH_SENTINEL.
+_HIGH_KEY = b"\xff"
+
+
+def _source_stamp(source: str) -> Tuple[int, int]:
+    """
+    Returns the (mtime, size) pair an index records about its source file.
+    :param source: Path of the words text file.
+    :return: As described.
+    """
+    stat = os.stat(source)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def default_index_path(source: str) -> str:
+    """
+    Returns the path of the compiled index kept next to the current version
+    of a words file, e.g. boggle_dict.<mtime>-<size>.idx.
+    :param source: Path of the words text file.
+    :return: As described.
+    """
+    return "{0}.{1}-{2}{3}".format(os.path.splitext(source)[0],
+                                   *_source_stamp(source), INDEX_SUFFIX)
+
+
+def _remove_stale_indexes(source: str, keep: str) -> None:
+    """
+    Deletes the default indexes of the older versions of a words file.
+    An index still mapped by a process can't be deleted on Windows, and is
+    left for a later call.
+    :param source: Path of the words text file.
+    :param keep: Path of the current index.
+    :return:
+    """
+    base = os.path.splitext(source)[0]
+    directory = os.path.dirname(base) or os.curdir
+    # Also matches the unstamped index name older versions used.
+    pattern = re.compile(re.escape(os.path.basename(base))
+                         + r"(\.\d+-\d+)?" + re.escape(INDEX_SUFFIX))
+    for name in os.listdir(directory):
+        if pattern.fullmatch(name) and name != os.path.basename(keep):
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+
+@boggle_metrics.timed("build_index")
+def build_index(source: str = DEFAULT_SOURCE,
+                target: Optional[str] = None) -> str:
+    """
+    Compiles a words text file into an index file. The file is written
+    aside and moved into place, so readers never see a partial index.
+    Moving it over an index mapped by another process fails on Windows, so
+    the target should be new, see default_index_path.
+    :param source: Path of the words text file.
+    :param target: Path of the index file, defaults to default_index_path.
+    :return: The path of the index file.
+    """
+    if target is None:
+        target = default_index_path(source)
+    mtime, size = _source_stamp(source)
+    with open(source) as file_obj:
+        words = sorted({line.strip(" \n\r") for line in file_obj})
+    blob = "".join(words).encode("ascii")
+    offsets = [_HEADER.size + (len(words) + 1) * _OFFSET_SIZE]
+    for word in words:
+        offsets.append(offsets[-1] + len(word))
+    tmp_target = "{0}.{1}.tmp".format(target, os.getpid())
+    with open(tmp_target, "wb") as file_obj:
+        file_obj.write(_HEADER.pack(INDEX_MAGIC, len(words), mtime, size))
+        file_obj.write(struct.pack("<{0}I".format(len(offsets)), *offsets))
+        file_obj.write(blob)
+    try:
+        os.replace(tmp_target, target)
+    except PermissionError:
+        # Another process compiled the same index first and already has it
+        # mapped (Windows): use that one.
+        os.remove(tmp_target)
+        if not is_index_fresh(source, target):
+            raise
+    return target
+
+
+def is_index_fresh(source: str = DEFAULT_SOURCE,
+                   target: Optional[str] = None) -> bool:
+    """
+    Checks if an index file exists and was compiled from the current
+    contents of its source file.
+    :param source: Path of the words text file.
+    :param target: Path of the index file, defaults to default_index_path.
+    :return: True/False
+    """
+    if target is None:
+        target = default_index_path(source)
+    try:
+        with open(target, "rb") as file_obj:
+            header = file_obj.read(_HEADER.size)
+    except OSError:
+        return False
+    if len(header) != _HEADER.size:
+        return False
+    magic, _, mtime, size = _HEADER.unpack(header)
+    return magic == INDEX_MAGIC and (mtime, size) == _source_stamp(source)
+
+
+class _MappedWords(Sequence[str]):
+    """
+    Read-only sequence view of the sorted words stored in a mapped index.
+    Words are decoded one at a time, when they are looked at.
+    """
+
+    def __init__(self, keys: "_MappedKeys"):
+        self._keys = keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @overload
+    def __getitem__(self, i: int) -> str: ...
+
+    @overload
+    def __getitem__(self, i: slice) -> Sequence[str]: ...
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self._keys)))]
+        return str(self._keys[i], "ascii")
+
+    def __iter__(self) -> Iterator[str]:
+        for key in self._keys:
+            yield str(key, "ascii")
+
+
+class _MappedKeys(Sequence[bytes]):
+    """
+    Read-only sequence view of the sorted words stored in a mapped index, as
+    the raw bytes bisection compares without decoding them.
+    """
+
+    def __init__(self, buffer: mmap.mmap):
+        _, count, _, _ = _HEADER.unpack_from(buffer)
+        offsets_start = _HEADER.size
+        offsets_end = offsets_start + (count + 1) * _OFFSET_SIZE
+        self._count = count
+        self._buffer = buffer
+        self._offsets = memoryview(buffer)[offsets_start:offsets_end].cast("I")
+
+    def __len__(self) -> int:
+        return self._count
+
+    @overload
+    def __getitem__(self, i: int) -> bytes: ...
+
+    @overload
+    def __getitem__(self, i: slice) -> Sequence[bytes]: ...
+
+    def __getitem__(self, i):
+        # Bisection calls this in its inner loop, so the common case of a
+        # valid non-negative index is kept to a single slice.
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._count))]
+        if i < 0 or i >= self._count:
+            if not -self._count <= i < 0:
+                raise IndexError("word index out of range")
+            i += self._count
+        return self._buffer[self._offsets[i]:self._offsets[i + 1]]
+
+    def length(self, i: int) -> int:
+        """
+        Returns the length of the i-th word, without reading it.
+        :param i: Non-negative position of the word.
+        :return: As described.
+        """
+        return self._offsets[i + 1] - self._offsets[i]
+
+    def __iter__(self) -> Iterator[bytes]:
+        buffer, offsets = self._buffer, self._offsets
+        for i in range(self._count):
+            yield buffer[offsets[i]:offsets[i + 1]]
+
+    def release(self) -> None:
+        """
+        Releases the view held on the mapped buffer.
+        :return:
+        """
+        self._offsets.release()
+
+
+class MappedWordIndex(boggle_solver.WordIndex):
+    """
+    WordIndex whose sorted table lives in a memory mapped index file.
+    Queries bisect the raw bytes of the file, so only the words a query
+    ends on are ever decoded.
+    """
+    _words: _MappedWords
+    _keys: _MappedKeys
+
+    def __init__(self, path: str):
+        with open(path, "rb") as file_obj:
+            self._buffer = mmap.mmap(file_obj.fileno(), 0,
+                                     access=mmap.ACCESS_READ)
+        if self._buffer[:len(INDEX_MAGIC)] != INDEX_MAGIC:
+            self._buffer.close()
+            raise ValueError("Not a words index file: {0}".format(path))
+        self._path = path
+        self._keys = _MappedKeys(self._buffer)
+        self._words = _MappedWords(self._keys)
+
+    def __contains__(self, word: object) -> bool:
+        if not isinstance(word, str):
+            return False
+        try:
+            key = word.encode("ascii")
+        except UnicodeEncodeError:
+            return False
+        i = bisect.bisect_left(self._keys, key)
+        return i < len(self._keys) and self._keys[i] == key
+
+    def word_length(self, i: int) -> int:
+        return self._keys.length(i)
+
+    def prefix_range(self, prefix: str, lo: int = 0,
+                     hi: Optional[int] = None) -> Tuple[int, int]:
+        if hi is None:
+            hi = len(self._keys)
+        try:
+            key = prefix.encode("ascii")
+        except UnicodeEncodeError:
+            return lo, lo
+        start = bisect.bisect_left(self._keys, key, lo, hi)
+        end = bisect.bisect_left(self._keys, key + _HIGH_KEY, start, hi)
+        return start, end
+
+    def get_path(self) -> str:
+        """
+        Getter method for the path of the mapped index file.
+        :return:
+        """
+        return self._path
+
+    def get_stamp(self) -> Tuple[int, int, int]:
+        """
+        Returns what identifies the compiled words: their count, and the
+        mtime (ns) and size of the words file they were compiled from.
+        :return: Tuple of (count, source mtime, source size).
+        """
+        _, count, mtime, size = _HEADER.unpack_from(self._buffer)
+        return count, mtime, size
+
+    def close(self) -> None:
+        """
+        Unmaps the index file. The index can't be queried afterwards.
+        :return:
+        """
+        self._keys.release()
+        self._buffer.close()
+
+
+@boggle_metrics.timed("open_index")
+def open_index(source: str = DEFAULT_SOURCE,
+               target: Optional[str] = None) -> MappedWordIndex:
+    """
+    Opens the compiled index of a words file, compiling it first if it is
+    missing or older than the words file. Compiling the default index also
+    deletes the default indexes of older versions of the file.
+    :param source: Path of the words text file.
+    :param target: Path of the index file, defaults to default_index_path.
+    :return: The mapped index.
+    """
+    is_default = target is None
+    if is_default:
+        target = default_index_path(source)
+    if not is_index_fresh(source, target):
+        build_index(source, target)
+        if is_default:
+            _remove_stale_indexes(source, target)
+    return MappedWordIndex(target)
+
+
+class IndexRegistry:
+    """
+    Process-wide registry of opened word indexes, keyed by the words file
+    path and its mtime and size, so that every model in the process shares
+    one read-only index per words file. Editing the words file changes the
+    key, and the next lookup compiles and opens a fresh index.
+    """
+    _indexes: Dict[Tuple[str, int, int], MappedWordIndex]
+    _hits: int  # Lookups answered by an already opened index.
+    _misses: int  # Lookups that had to open (and maybe compile) an index.
+    _load_time: float  # Total seconds spent opening indexes.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._indexes = {}
+        self._hits = 0
+        self._misses = 0
+        self._load_time = 0.0
+
+    def get(self, source: str = DEFAULT_SOURCE) -> MappedWordIndex:
+        """
+        Returns the shared index of a words file, opening it on first use.
+        :param source: Path of the words text file.
+        :return: As described.
+        """
+        path = os.path.abspath(source)
+        key = (path,) + _source_stamp(path)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._hits += 1
+                boggle_metrics.increment("dictionary_hits")
+                return index
+            self._misses += 1
+            boggle_metrics.increment("dictionary_misses")
+            start = time.perf_counter()
+            index = open_index(path)
+            self._load_time += time.perf_counter() - start
+            # Indexes of older versions of the file stay open for the models
+            # still holding them, but are no longer handed out.
+            for old_key in [k for k in self._indexes if k[0] == path]:
+                del self._indexes[old_key]
+            self._indexes[key] = index
+            return index
+
+    def get_stats(self) -> Dict[str, Union[int, float]]:
+        """
+        Returns the registry counters: hits, misses, loaded (number of
+        indexes currently shared) and load_time (seconds).
+        :return: As described.
+        """
+        with self._lock:
+            return {"hits": self._hits, "misses": self._misses,
+                    "loaded": len(self._indexes),
+                    "load_time": self._load_time}
+
+    def clear(self) -> None:
+        """
+        Forgets the shared indexes and resets the counters. Indexes already
+        handed out stay usable.
+        :return:
+        """
+        with self._lock:
+            self._indexes = {}
+            self._hits = 0
+            self._misses = 0
+            self._load_time = 0.0
+
+
+REGISTRY = IndexRegistry()
+
+
+def get_index(source: str = DEFAULT_SOURCE) -> MappedWordIndex:
+    """
+    Returns the process-wide shared index of a words file.
+    :param source: Path of the words text file.
+    :return: As described.
+    """
+    return REGISTRY.get(source)
+
+
+if __name__ == "__main__":
+    print(build_index(*sys.argv[1:3]))
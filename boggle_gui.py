@@ -1,6 +1,8 @@
 import tkinter as tki
 from typing import Callable, Dict, List, Any, Tuple, Union
 
+import boggle_metrics
+
 # PROGRAM DATA-STRUCTURES #
 BOARD_TYPE = List[List[str]]
 COORDS_TYPE = Tuple[int, int]
@@ -24,7 +26,7 @@ BUTTON_STYLE = {"font": ("Courier", 30),
                 "width": 2,
                 "height": 1}
 SUBMIT_BUTTON_TEXT = "Submit"
-SUBMIT_BUTTON_COORD = (4, 1)
+SUBMIT_BUTTON_COORD = (4, 1)  # Submit button coordinates on a 4x4 board
 DISPLAY_LABEL_FONT = ("Courier", 30)
 USED_WORDS_FONT = ("Courier", 20)
 
@@ -39,8 +41,22 @@ DETAILS_LABEL_WIDTH = 10
 DETAILS_LABEL_HEIGHT = 8
 FONT_SIZE = 15
 
+
+def submit_button_layout(board: BOARD_TYPE) -> Tuple[COORDS_TYPE, int]:
+    """
+    Returns where the submit button goes under a board: its coordinates and
+    its column span, centered under the board's columns.
+    :param board: board, nested list of string (button characters)
+    :return: tuple of the button coordinates and column span
+    """
+    cols = len(board[0])
+    span = min(cols, 2 if cols % 2 == 0 else 3)
+    return (len(board), (cols - span) // 2), span
+
+
 class BoggleGUI:
     _buttons: Dict[COORDS_TYPE, BUTTONS_INNER_DICT] = {}
+    _submit_coord: COORDS_TYPE = SUBMIT_BUTTON_COORD
 
     def __init__(self, board):
         # Tkinter / OS window settings
@@ -63,10 +79,14 @@ class BoggleGUI:
                                         relief="ridge")
         self._display_label.pack(side=tki.TOP, fill=tki.BOTH, expand=True)
 
-        self._used_words = tki.Label(self._top_frame, text="Guessed Words",
-                                     font=USED_WORDS_FONT,
-                                     bg=WINDOW_BG_COLOR, width=30, height=3,
-                                     relief="ridge", wraplengt=700)
+        # A text widget, so found words are appended without re-rendering the
+        # words already displayed.
+        self._used_words = tki.Text(self._top_frame, font=USED_WORDS_FONT,
+                                    bg=WINDOW_BG_COLOR, width=30, height=3,
+                                    relief="ridge", wrap=tki.WORD)
+        self._used_words.tag_configure("center", justify=tki.CENTER)
+        self._used_words.insert(tki.END, "Guessed Words", "center")
+        self._used_words.configure(state=tki.DISABLED)
         self._used_words.pack(side=tki.TOP, fill=tki.BOTH)
 
         self._timer_label = tki.Label(self._top_frame, text="Timer",
@@ -101,14 +121,33 @@ class BoggleGUI:
         """
         self._display_label["text"] = display_text
 
+    @boggle_metrics.timed("gui.set_display_used")
     def set_display_used(self, display_text: list) -> None:
         """
         Method that sets the display of the used word list
         :param display_text: list of strings of the used words
         :return:
         """
-        self._used_words["text"] = display_text
+        self._used_words.configure(state=tki.NORMAL)
+        self._used_words.delete("1.0", tki.END)
+        self._used_words.insert(tki.END, " ".join(display_text), "center")
+        self._used_words.configure(state=tki.DISABLED)
+
+    @boggle_metrics.timed("gui.add_display_used")
+    def add_display_used(self, word: str) -> None:
+        """
+        Method that appends a word to the display of the used word list
+        :param word: string of the newly used word
+        :return:
+        """
+        self._used_words.configure(state=tki.NORMAL)
+        if self._used_words.compare("end-1c", "!=", "1.0"):
+            word = " " + word
+        self._used_words.insert(tki.END, word, "center")
+        self._used_words.see(tki.END)
+        self._used_words.configure(state=tki.DISABLED)
 
+    @boggle_metrics.timed("gui.set_timer_display")
     def set_timer_display(self, display_text: str) -> None:
         """
         Method that sets the display of the timer label
@@ -146,6 +185,13 @@ class BoggleGUI:
         """
         self.__board = board
 
+    def get_submit_button_coord(self) -> COORDS_TYPE:
+        """
+        Method that returns the coordinates of the submit button
+        :return: tuple of the button coordinates
+        """
+        return self._submit_coord
+
     def get_button_cords(self) -> List[COORDS_TYPE]:
         """
         Method that returns a list of all the buttons coordinates
@@ -170,16 +216,21 @@ class BoggleGUI:
         submit button).
         :return:
         """
-        for i in range(4):
+        for button_info in self._buttons.values():
+            button_info["button"].destroy()
+        self._buttons = {}
+
+        for i in range(len(self.__board[0])):
             tki.Grid.columnconfigure(self._middle_frame, i, weight=1)
 
-        for i in range(4):
+        for i in range(len(self.__board)):
             tki.Grid.rowconfigure(self._middle_frame, i, weight=1)
 
         for x in range(len(self.__board)):
             for y in range(len(self.__board[x])):
                 self._make_button("", x, y)
-        self._make_button("", *SUBMIT_BUTTON_COORD, columnspan=2)
+        self._submit_coord, span = submit_button_layout(self.__board)
+        self._make_button("", *self._submit_coord, columnspan=span)
 
     def _make_button(self, button_char: str, row: int, col: int,
                      rowspan: int = 1, columnspan: int = 1) -> tki.Button:
@@ -229,8 +280,9 @@ class BoggleGUI:
         for x in range(len(self.__board)):
             for y in range(len(self.__board[x])):
                 self._buttons[(x, y)]["button"]["text"] = self.__board[x][y]
-        self._buttons[SUBMIT_BUTTON_COORD]["button"]["text"] = SUBMIT_BUTTON_TEXT
+        self._buttons[self._submit_coord]["button"]["text"] = SUBMIT_BUTTON_TEXT
 
+    @boggle_metrics.timed("gui.set_buttons_color")
     def set_buttons_color(self, buttons_coords: List[COORDS_TYPE],
                           color: str, is_submit: bool) -> None:
         """
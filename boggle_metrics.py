@@ -0,0 +1,277 @@
+"""
+Opt-in instrumentation of the hot paths.
+Functions decorated with timed record their call count and durations, and
+code can bump named counters with increment. Recording is off by default, a
+disabled call only costs a flag check; set BOGGLE_METRICS=1 in the
+environment, or call enable(), to switch it on.
+Recorded metrics are exported as Prometheus text (export_prometheus).
+RoundProfiler captures a cProfile (or pyinstrument, if installed) profile of
+a stretch of play, e.g. one round.
+"""
+import cProfile
+import functools
+import io
+import os
+import pstats
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, TypeVar, Union
+
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+METRICS_PREFIX = "boggle"
+PROFILE_ENV = "BOGGLE_PROFILE"  # Output path of a one round profile.
+
+FUNC_TYPE = TypeVar("FUNC_TYPE", bound=Callable[..., Any])
+
+
+class _Timing:
+    """
+    Durations recorded for one timed call site.
+    """
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+class MetricsRegistry:
+    """
+    Process-wide timings and counters.
+    """
+    _timings: Dict[str, _Timing]
+    _counters: Dict[str, int]
+
+    def __init__(self, enabled: bool = False):
+        """
+        :param enabled: Whether recording starts on.
+        """
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._timings = {}
+        self._counters = {}
+
+    def observe(self, name: str, seconds: float) -> None:
+        """
+        Records one call duration.
+        :param name: Name of the timed call.
+        :param seconds: Duration of the call.
+        :return:
+        """
+        with self._lock:
+            timing = self._timings.get(name)
+            if timing is None:
+                timing = self._timings[name] = _Timing()
+            timing.count += 1
+            timing.total += seconds
+            if seconds > timing.max:
+                timing.max = seconds
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        """
+        Adds to a counter.
+        :param name: Name of the counter.
+        :param amount: Amount to add.
+        :return:
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def get_stats(self) -> Dict[str, Dict[str, Union[int, float]]]:
+        """
+        Returns the recorded metrics: for every timed call its count, total
+        and max seconds, and under "counters" the value of every counter.
+        :return: As described.
+        """
+        with self._lock:
+            stats: Dict[str, Dict[str, Union[int, float]]] = {
+                name: {"count": timing.count, "total": timing.total,
+                       "max": timing.max}
+                for name, timing in self._timings.items()
+            }
+            stats["counters"] = dict(self._counters)
+            return stats
+
+    def export_prometheus(self, prefix: str = METRICS_PREFIX) -> str:
+        """
+        Returns the recorded metrics in the Prometheus text exposition
+        format: a summary of the call durations and a gauge of their maximum,
+        labelled by call, and one counter per counter name.
+        :param prefix: Prefix of the metric names.
+        :return: As described.
+        """
+        with self._lock:
+            timings = sorted(self._timings.items())
+            counters = sorted(self._counters.items())
+        lines = [
+            "# HELP {0}_call_seconds Duration of instrumented calls."
+            .format(prefix),
+            "# TYPE {0}_call_seconds summary".format(prefix)
+        ]
+        for name, timing in timings:
+            lines.append('{0}_call_seconds_count{{call="{1}"}} {2}'.format(
+                prefix, name, timing.count
+            ))
+            lines.append('{0}_call_seconds_sum{{call="{1}"}} {2!r}'.format(
+                prefix, name, timing.total
+            ))
+        lines += [
+            "# HELP {0}_call_seconds_max Longest instrumented call."
+            .format(prefix),
+            "# TYPE {0}_call_seconds_max gauge".format(prefix)
+        ]
+        for name, timing in timings:
+            lines.append('{0}_call_seconds_max{{call="{1}"}} {2!r}'.format(
+                prefix, name, timing.max
+            ))
+        for name, value in counters:
+            lines.append("# TYPE {0}_{1}_total counter".format(prefix, name))
+            lines.append("{0}_{1}_total {2}".format(prefix, name, value))
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        """
+        Forgets every recorded metric.
+        :return:
+        """
+        with self._lock:
+            self._timings = {}
+            self._counters = {}
+
+
+METRICS = MetricsRegistry(os.environ.get("BOGGLE_METRICS", "") not in
+                          ("", "0"))
+
+
+def enable(enabled: bool = True) -> None:
+    """
+    Switches recording on or off.
+    :param enabled: True to record, False to stop recording.
+    :return:
+    """
+    METRICS.enabled = enabled
+
+
+def timed(name: str) -> Callable[[FUNC_TYPE], FUNC_TYPE]:
+    """
+    Decorator recording the durations of a function's calls while metrics
+    are enabled.
+    :param name: Name the calls are recorded under.
+    :return: The decorator.
+    """
+    def decorator(func: FUNC_TYPE) -> FUNC_TYPE:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not METRICS.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                METRICS.observe(name, time.perf_counter() - start)
+        return wrapper  # type: ignore
+    return decorator
+
+
+def increment(name: str, amount: int = 1) -> None:
+    """
+    Adds to a counter while metrics are enabled.
+    :param name: Name of the counter.
+    :param amount: Amount to add.
+    :return:
+    """
+    if METRICS.enabled:
+        METRICS.increment(name, amount)
+
+
+def export_prometheus() -> str:
+    """
+    Returns the process-wide metrics as Prometheus text, see
+    MetricsRegistry.export_prometheus.
+    :return:
+    """
+    return METRICS.export_prometheus()
+
+
+class RoundProfiler:
+    """
+    Profiles the calling thread between start and stop, e.g. over one round,
+    and writes the profile to a file.
+    """
+
+    def __init__(self, output: str, kind: Optional[str] = None):
+        """
+        :param output: Path of the profile file.
+        :param kind: "cprofile" (writes pstats data, open it with pstats or
+        snakeviz) or "pyinstrument" (writes an HTML report). Defaults to
+        pyinstrument for an .html output, cprofile otherwise.
+        """
+        if kind is None:
+            kind = "pyinstrument" if output.endswith(".html") else "cprofile"
+        if kind == "pyinstrument" and pyinstrument is None:
+            raise ValueError("pyinstrument is not installed.")
+        if kind not in ("cprofile", "pyinstrument"):
+            raise ValueError("Unknown profiler: {0}".format(kind))
+        self._output = output
+        self._kind = kind
+        self._profiler: Any = None
+
+    def is_running(self) -> bool:
+        """
+        Checks if the profiler is between start and stop.
+        :return: True/False
+        """
+        return self._profiler is not None
+
+    def start(self) -> None:
+        """
+        Starts profiling. Starting a running profiler does nothing.
+        :return:
+        """
+        if self._profiler is not None:
+            return
+        if self._kind == "pyinstrument":
+            self._profiler = pyinstrument.Profiler()
+            self._profiler.start()
+        else:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def stop(self) -> str:
+        """
+        Stops profiling and writes the profile file.
+        :return: A text summary of the profile, the top functions by
+        cumulative time.
+        """
+        profiler, self._profiler = self._profiler, None
+        if profiler is None:
+            return ""
+        if self._kind == "pyinstrument":
+            profiler.stop()
+            with open(self._output, "w") as file_obj:
+                file_obj.write(profiler.output_html())
+            return profiler.output_text()
+        profiler.disable()
+        profiler.dump_stats(self._output)
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats(
+            "cumulative"
+        ).print_stats(20)
+        return summary.getvalue()
+
+
+def round_profiler_from_env() -> Optional[RoundProfiler]:
+    """
+    Returns a profiler writing to the path set in BOGGLE_PROFILE, None if it
+    is not set.
+    :return: As described.
+    """
+    output = os.environ.get(PROFILE_ENV)
+    if not output:
+        return None
+    return RoundProfiler(output)
@@ -1,32 +1,70 @@
-from typing import List, Tuple
+import math
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional, Set, Tuple
+import boggle_metrics
 import boggle_utils
+import boggle_solver
+import boggle_dict_index
 import boggle_board_randomizer
 
 
 class BoggleModel:
     _board: boggle_utils.BOARD_TYPE
     _words_list: boggle_utils.WORDS_TYPE
+    _words_index: boggle_solver.WordIndex  # Prefix index of _words_list.
     _score: int  # User score
     _is_game_stopped: bool  # Indicates whether a round is over
-    _timer: int  # Seconds left until round is over.
+    _game_duration: int  # Round duration in seconds.
+    _deadline: Optional[float]  # Clock time the round ends at, None while
+    # the game is stopped.
     _words_found_list: List[str]  # List of the words the legal words the user
     # have found.
+    _words_found_set: Set[str]  # The same words, for constant time lookups.
     _current_display: str  # The current word the user is building.
     _cur_path: List[Tuple[int, int]]  # The path of the current word the user
     # is building.
     _message: str
+    _solution: "Future[boggle_solver.BoardSolution]"  # Solution of _board,
+    # computed in the background.
+    _max_score: Optional[int]  # Cached max score of _board, None until the
+    # solution is first used.
 
     GAME_DURATION = 180  # In seconds
+    clock = staticmethod(time.monotonic)  # Clock the round deadline is on.
 
     BOARD_TYPE = List[List[str]]
 
-    def __init__(self, board: List[List[str]]):
+    # Shared by all models. Boards are solved outside the caller's thread so
+    # that a new round never waits for its board to be solved.
+    _solver_pool = ThreadPoolExecutor(max_workers=1,
+                                      thread_name_prefix="boggle-solver")
+
+    def __init__(self, board: List[List[str]],
+                 solution: Optional[boggle_solver.BoardSolution] = None,
+                 game_duration: int = GAME_DURATION,
+                 words_index: Optional[boggle_solver.WordIndex] = None):
+        """
+        :param board: Board of the first round.
+        :param solution: The board's solution if already computed, see
+        stop_game.
+        :param game_duration: Round duration in seconds.
+        :param words_index: Dictionary to play with, the shared index of the
+        default words file if None.
+        """
         self._board = board
-        self._words_list = boggle_utils.load_words_list()
-        self._reset_game(board)
-        self._max_score_paths = boggle_utils.max_score_paths(
-            self._board, self._words_list
-        )
+        self._game_duration = game_duration
+        self._words_index = (boggle_dict_index.get_index()
+                             if words_index is None else words_index)
+        self._words_list = self._words_index
+        self._reset_game(board, solution)
+
+    def get_board(self) -> BOARD_TYPE:
+        """
+        Getter method to the board of the current round.
+        :return:
+        """
+        return self._board
 
     def get_display(self) -> str:
         """
@@ -49,6 +87,16 @@ class BoggleModel:
         """
         return self._words_found_list
 
+    def get_last_found_word(self) -> Optional[str]:
+        """
+        Returns the last legal word the user has found, None if no word was
+        found yet this round.
+        :return:
+        """
+        if self._words_found_list:
+            return self._words_found_list[-1]
+        return None
+
     def get_current_path(self) -> boggle_utils.PATH_TYPE:
         """
         Getter method for the current path of the word the user is currently
@@ -62,7 +110,7 @@ class BoggleModel:
         Checks if there is still time left.
         :return: True/False
         """
-        if self._timer > 0:
+        if self.get_timer() > 0:
             return True
         else:
             return False
@@ -72,17 +120,29 @@ class BoggleModel:
         Returns time in minutes:seconds format while reducing the time left.
         :return:
         """
-        if self._timer % 60 >= 10:
-            return '{0}:{1}'.format(self._timer//60, self._timer%60)
+        timer = self.get_timer()
+        if timer % 60 >= 10:
+            return '{0}:{1}'.format(timer//60, timer%60)
         else:
-            return '{0}:0{1}'.format(self._timer//60, self._timer%60)
+            return '{0}:0{1}'.format(timer//60, timer%60)
 
     def get_timer(self) -> int:
         """
-        Getter method returns how many seconds left until round is over.
+        Returns how many seconds left until round is over, computed from the
+        round's deadline so it never drifts with the caller's timers.
+        :return:
+        """
+        if self._deadline is None:
+            return self._game_duration
+        return max(0, math.ceil(self._deadline - self.clock()))
+
+    def get_deadline(self) -> Optional[float]:
+        """
+        Getter method for the clock time the round ends at, None while the
+        game is stopped.
         :return:
         """
-        return self._timer
+        return self._deadline
 
     def get_score(self) -> int:
         """
@@ -100,11 +160,13 @@ class BoggleModel:
 
     def reduce_time(self) -> None:
         """
-        Reduces the time by 1 second.
+        Reduces the time by 1 second, moving the deadline closer.
         :return:
         """
-        self._timer -= 1
+        if self._deadline is not None:
+            self._deadline -= 1
 
+    @boggle_metrics.timed("click")
     def click(self, cell: Tuple[int, int]) -> bool:
         """
         Implement button click logic.
@@ -126,22 +188,14 @@ class BoggleModel:
         :param cell: Coorsinatdd of the cell (x, y) - (row, column).
         :return: True upon success, False otherwise.
         """
-        if (
-                cell not in self._cur_path
-                and (
-                    len(self._cur_path) == 0
-                    or (
-                            abs(self._cur_path[-1][0] - cell[0]) <= 1
-                            and abs(self._cur_path[-1][1] - cell[1]) <= 1
-                    )
-                )
-        ):
+        if boggle_utils.can_extend_path(self._cur_path, cell):
             self._cur_letter = letter
             self._current_display += letter
             self._cur_path.append(cell)
             return True
         return False
 
+    @boggle_metrics.timed("do_submit")
     def do_submit(self) -> bool:
         """
         Handles submit process logic.
@@ -149,15 +203,36 @@ class BoggleModel:
         is valid), False otherwise.
         """
         is_path_valid = False
-        word = boggle_utils.is_valid_path(self._board, self._cur_path,
-                                        self._words_list)
-        if word is not None and word not in self._words_found_list:
+        try:
+            # Constant time lookup in the board's solution
+            word = self.get_solution().word_for_path(self._cur_path)
+        except LookupError:
+            word = boggle_utils.is_valid_path(self._board, self._cur_path,
+                                              self._words_list)
+        if word is not None and word not in self._words_found_set:
             self._score += len(self._cur_path) ** 2
             self._words_found_list.append(word)
+            self._words_found_set.add(word)
             is_path_valid = True
+        boggle_metrics.increment("submit_accepted" if is_path_valid
+                                 else "submit_rejected")
         self._do_clear()
         return is_path_valid
 
+    def submit_path(self, path: boggle_utils.PATH_TYPE) -> bool:
+        """
+        Submits a whole path at once, as if its cells were clicked one by one
+        and then submitted. Used by clients that send complete words.
+        :param path: Cells of the word, in order.
+        :return: True upon success (see do_submit), False otherwise.
+        """
+        self._do_clear()
+        for cell in path:
+            if not self.click(cell):
+                self._do_clear()
+                return False
+        return self.do_submit()
+
     def _do_clear(self) -> None:
         """
         Clears the game state.
@@ -167,45 +242,106 @@ class BoggleModel:
         self._current_display = ""
         self._cur_path = []
 
-    def _reset_game(self, board: BOARD_TYPE) -> None:
+    def _reset_game(self, board: BOARD_TYPE,
+                    solution: Optional[boggle_solver.BoardSolution] = None
+                    ) -> None:
         """
         Resets the game, handling new round logic.
         :param board: Board to initialize the game with.
+        :param solution: The board's solution if already computed, otherwise
+        it is computed in the background.
         :return:
         """
-        self._timer = self.GAME_DURATION
+        self._deadline = None
         self._score = 0
         self._is_game_stopped = True
         self._words_found_list = []
+        self._words_found_set = set()
         self._board = board
+        self._max_score = None
+        if solution is not None:
+            self._solution = Future()
+            self._solution.set_result(solution)
+        else:
+            self._solution = self._solver_pool.submit(
+                boggle_solver.BoardSolution.solve, board, self._words_index
+            )
         self._do_clear()
 
     def start_game(self) -> None:
         """
-        Setter method for the _is_game_stopped data member.
+        Setter method for the _is_game_stopped data member. Starts the round
+        clock.
         :return:
         """
         self._is_game_stopped = False
+        self._deadline = self.clock() + self._game_duration
 
-    def stop_game(self, board: BOARD_TYPE) -> None:
+    def stop_game(self, board: BOARD_TYPE,
+                  solution: Optional[boggle_solver.BoardSolution] = None
+                  ) -> None:
         """
         Stops and resest a currently runnig game / round.
         :param board:
+        :param solution: The new board's solution, if already computed.
         :return:
         """
         self._is_game_stopped = True
-        self._reset_game(board)
+        self._reset_game(board, solution)
+
+    def get_solution(self) -> boggle_solver.BoardSolution:
+        """
+        Returns the solution of the current board, waiting for the
+        background solve to finish if it has not yet.
+        :return:
+        """
+        return self._solution.result()
+
+    def is_solution_ready(self) -> bool:
+        """
+        Checks if the solution of the current board is already computed.
+        :return: True/False
+        """
+        return self._solution.done()
 
     def max_score(self) -> int:
         """
         Returns the highest score can be possibly achieved in the board
         :return:
         """
-        return sum(map(lambda path: len(path) ** 2, self._max_score_paths))
+        if self._max_score is None:
+            self._max_score = self.get_solution().max_score()
+        return self._max_score
 
     def current_score_percentage(self) -> str:
         """
         Returns score/max possible score ratio in percentage.
         :return:
         """
-        return "{:.2%}".format(self._score / self.max_score())
+        max_score = self.max_score()
+        if max_score == 0:
+            # No word on the board, nothing to score against.
+            return "{:.2%}".format(0)
+        return "{:.2%}".format(self._score / max_score)
+
+    def get_hint(self) -> Optional[Tuple[str, List[boggle_utils.PATH_TYPE]]]:
+        """
+        Returns a word of the board the user has not found yet, the highest
+        scoring one, with every path it can be formed along (looked up in
+        the board's solution, see BoardSolution.get_word_paths).
+        :return: Tuple of the word and its paths, the highest score path
+        first, None if every word was found.
+        """
+        solution = self.get_solution()
+        missed = [word for word in solution.get_words()
+                  if word not in self._words_found_set]
+        if not missed:
+            return None
+        word = max(missed, key=solution.get_word_score)
+        best_path = solution.get_paths()[word]
+        try:
+            paths = solution.get_word_paths(word)
+        except LookupError:
+            paths = []
+        return word, [best_path] + [path for path in paths
+                                    if path != best_path]
@@ -0,0 +1,147 @@
+"""
+Multiplayer rounds on a shared board.
+Every player submits paths concurrently; at the end of the round, words found
+by more than one player cancel out (classic Boggle rules) and the remaining
+words score like in BoggleModel.do_submit.
+"""
+import threading
+from typing import Dict, List, Optional
+
+import boggle_solver
+import boggle_utils
+
+ROUND_RESULT_TYPE = Dict[str, Dict[str, object]]
+
+
+class _PlayerState:
+    """
+    Words a player found, with the score of each. Guarded by the player's
+    own lock, so players never contend with each other.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.words: Dict[str, int] = {}  # Word to its score, in found order.
+
+
+class MultiplayerRound:
+    """
+    A round several players play on the same board.
+    """
+    _players: Dict[str, _PlayerState]
+
+    def __init__(self, solution: boggle_solver.BoardSolution):
+        """
+        :param solution: Solution of the round's board. Submissions are
+        validated against its words, so no dictionary lookup is needed.
+        """
+        self._solution = solution
+        self._board = solution.get_board()
+        self._words = solution.get_cells()
+        self._players = {}
+        self._players_lock = threading.Lock()
+        self._finished = False
+        self._result: Optional[ROUND_RESULT_TYPE] = None
+
+    def get_board(self) -> boggle_utils.BOARD_TYPE:
+        """
+        Getter method for the round's board.
+        :return:
+        """
+        return self._board
+
+    def get_players(self) -> List[str]:
+        """
+        Returns the players of the round, in joining order.
+        :return:
+        """
+        return list(self._players)
+
+    def is_finished(self) -> bool:
+        """
+        Getter method telling if the round has ended.
+        :return:
+        """
+        return self._finished
+
+    def join(self, player: str) -> None:
+        """
+        Adds a player to the round. Joining twice does nothing.
+        :param player: Player name.
+        :return:
+        """
+        with self._players_lock:
+            if self._finished:
+                raise ValueError("The round has ended.")
+            self._players.setdefault(player, _PlayerState())
+
+    def submit(self, player: str, path: boggle_utils.PATH_TYPE
+               ) -> Optional[str]:
+        """
+        Submits a player's path. Safe to call from many threads at once.
+        :param player: Player name, the player must have joined.
+        :param path: Cells of the word, in order.
+        :return: The word if the path holds a word on the board that the
+        player didn't find yet this round, None otherwise.
+        """
+        state = self._players.get(player)
+        if state is None:
+            raise ValueError("Unknown player: {0}".format(player))
+        if self._finished:
+            return None
+        # The same checks as clicking the path's cells in BoggleModel.
+        rows, cols = len(self._board), len(self._board[0])
+        for i, (row, col) in enumerate(path):
+            if (
+                    not 0 <= row < rows or not 0 <= col < cols
+                    or not boggle_utils.can_extend_path(path[:i], (row, col))
+            ):
+                return None
+        try:
+            word = self._solution.word_for_path(path)
+        except LookupError:
+            word = boggle_utils.is_valid_path(self._board, path, self._words)
+        if word is None:
+            return None
+        with state.lock:
+            if self._finished or word in state.words:
+                return None
+            state.words[word] = len(path) ** 2
+        return word
+
+    def finish(self) -> ROUND_RESULT_TYPE:
+        """
+        Ends the round and scores it in one pass: a word found by two players
+        or more is cancelled for all of them, every other word scores for
+        its player. Finishing an ended round returns the same result.
+        :return: For every player, their score, words (kept words, in found
+        order) and cancelled words.
+        """
+        with self._players_lock:
+            if self._result is not None:
+                return self._result
+            self._finished = True
+            # Wait for submissions in flight, then freeze every player.
+            states = list(self._players.items())
+            for _, state in states:
+                state.lock.acquire()
+            try:
+                finders: Dict[str, int] = {}
+                for _, state in states:
+                    for word in state.words:
+                        finders[word] = finders.get(word, 0) + 1
+                result: ROUND_RESULT_TYPE = {}
+                for player, state in states:
+                    words = [word for word in state.words
+                             if finders[word] == 1]
+                    result[player] = {
+                        "score": sum(state.words[word] for word in words),
+                        "words": words,
+                        "cancelled": [word for word in state.words
+                                      if finders[word] > 1]
+                    }
+            finally:
+                for _, state in states:
+                    state.lock.release()
+            self._result = result
+            return result
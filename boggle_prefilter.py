@@ -0,0 +1,197 @@
+"""
+Board-level precheck of a dictionary.
+A word a board can hold uses no letter more often than the board has it, and
+each of its consecutive letter pairs (bigrams) sits inside a face ('QU') or
+across two adjacent cells. WordFilter precomputes the letter counts and a
+bigram bitset of every dictionary word, so that a board rejects most of the
+dictionary in one vectorized pass before any path is followed.
+The words left are a small WordIndex that the solvers take in place of the
+dictionary, e.g. max_score_paths(board, word_filter.candidates(board)).
+The pass needs NumPy, an optional dependency (pip install numpy). Without
+it, filter checks the words one by one, which costs more than the board walk
+it saves, so candidates returns the whole dictionary instead, and the per
+word data is only built if filter is called.
+"""
+from collections import Counter
+from typing import Iterable, List, Optional, Tuple
+
+import boggle_solver
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+# Bigram bitsets are stored in 64 bit words, BIGRAM_WORDS of them per word.
+BIGRAM_WORDS = (len(ALPHABET) ** 2 + 63) // 64
+
+_LETTER_IDS = {letter: i for i, letter in enumerate(ALPHABET)}
+
+
+def board_profile(board: boggle_solver.BOARD_TYPE
+                  ) -> Tuple[List[int], int, int]:
+    """
+    Returns what a board offers to the words it may hold. Letters outside
+    ALPHABET are not profiled, see WordFilter.
+    :param board: Boggle board.
+    :return: Tuple of the count of every letter of ALPHABET on the board, the
+    bitmask of those letters (bit i for ALPHABET[i]) and the bitset of the
+    bigrams a path can spell (bit i * len(ALPHABET) + j for ALPHABET[i]
+    followed by ALPHABET[j]).
+    """
+    graph = boggle_solver.BoardGraph(board)
+    letters, neighbours = graph.get_letters(), graph.get_neighbours()
+    counts = [0] * len(ALPHABET)
+    letter_mask = 0
+    bigrams = 0
+    for cell, face in enumerate(letters):
+        ids = [_LETTER_IDS.get(letter) for letter in face]
+        for letter_id in ids:
+            if letter_id is not None:
+                counts[letter_id] += 1
+                letter_mask |= 1 << letter_id
+        for first, second in zip(ids, ids[1:]):
+            if first is not None and second is not None:
+                bigrams |= 1 << first * len(ALPHABET) + second
+        if not face or ids[-1] is None:
+            continue
+        for next_cell in neighbours[cell]:
+            second = _LETTER_IDS.get(letters[next_cell][:1])
+            if second is not None:
+                bigrams |= 1 << ids[-1] * len(ALPHABET) + second
+    return counts, letter_mask, bigrams
+
+
+def _word_profile(word: str) -> Tuple[int, int]:
+    """
+    Returns the letter bitmask and the bigram bitset of a word, see
+    board_profile.
+    :param word: The word.
+    :return: As described.
+    """
+    ids = [_LETTER_IDS.get(letter) for letter in word]
+    letter_mask = 0
+    for letter_id in ids:
+        if letter_id is not None:
+            letter_mask |= 1 << letter_id
+    bigrams = 0
+    for first, second in zip(ids, ids[1:]):
+        if first is not None and second is not None:
+            bigrams |= 1 << first * len(ALPHABET) + second
+    return letter_mask, bigrams
+
+
+class WordFilter:
+    """
+    Rejects the dictionary words a board can't hold, without walking the
+    board. The checks are necessary conditions only: every word the board
+    holds is kept, and the solvers sort out the rest. Letters outside
+    ALPHABET are not checked.
+    """
+    _words: Optional[List[str]]  # The dictionary, in its index's order.
+    # Built with the per word data.
+    _profiles: Optional[List[Tuple[int, int]]]  # Letter bitmask and bigram
+    # bitset of every word, for filtering without NumPy. Built on first use.
+
+    def __init__(self, words: Iterable[str]):
+        """
+        :param words: Words iterable or WordIndex.
+        """
+        self._index = boggle_solver.as_word_index(words)
+        self._words = None
+        self._profiles = None
+        if numpy is not None:
+            self._words = list(self._index)
+            self._build_arrays()
+
+    def _build_arrays(self) -> None:
+        """
+        Builds the per word arrays from all the words' letters at once: a
+        letter bitmask, a letter count vector and a bigram bitset per word.
+        :return:
+        """
+        count = len(self._words)
+        blob = numpy.frombuffer(
+            "".join(self._words).encode("ascii", "replace"), numpy.uint8
+        )
+        lengths = numpy.fromiter((len(word) for word in self._words),
+                                 numpy.int64, count)
+        owners = numpy.repeat(numpy.arange(count), lengths)
+        ids = blob.astype(numpy.int64) - ord(ALPHABET[0])
+        valid = (ids >= 0) & (ids < len(ALPHABET))
+        self._letter_masks = numpy.zeros(count, numpy.uint32)
+        numpy.bitwise_or.at(self._letter_masks, owners[valid],
+                            numpy.uint32(1) << ids[valid].astype(numpy.uint32))
+        self._counts = numpy.zeros((count, len(ALPHABET)), numpy.uint8)
+        numpy.add.at(self._counts, (owners[valid], ids[valid]), 1)
+        # Consecutive letters of the blob that belong to the same word.
+        pairs = (owners[:-1] == owners[1:]) & valid[:-1] & valid[1:]
+        bigram_ids = (ids[:-1] * len(ALPHABET) + ids[1:])[pairs]
+        self._bigrams = numpy.zeros((count, BIGRAM_WORDS), numpy.uint64)
+        numpy.bitwise_or.at(
+            self._bigrams, (owners[:-1][pairs], bigram_ids >> 6),
+            numpy.uint64(1) << (bigram_ids & 63).astype(numpy.uint64)
+        )
+
+    def filter(self, board: boggle_solver.BOARD_TYPE) -> List[str]:
+        """
+        Returns the words that pass the board's precheck: letters the board
+        has, no letter more often than on the board, and only bigrams the
+        board can spell.
+        :param board: Boggle board.
+        :return: The words kept, in the dictionary's order.
+        """
+        counts, letter_mask, bigrams = board_profile(board)
+        if numpy is not None:
+            return self._filter_arrays(counts, letter_mask, bigrams)
+        if self._profiles is None:
+            self._words = list(self._index)
+            self._profiles = [_word_profile(word) for word in self._words]
+        kept = []
+        for word, (word_mask, word_bigrams) in zip(self._words,
+                                                  self._profiles):
+            if word_mask & ~letter_mask or word_bigrams & ~bigrams:
+                continue
+            letter_counts = Counter(word)
+            if all(letter_counts[letter] <= counts[_LETTER_IDS[letter]]
+                   for letter in letter_counts if letter in _LETTER_IDS):
+                kept.append(word)
+        return kept
+
+    def _filter_arrays(self, counts: List[int], letter_mask: int,
+                       bigrams: int) -> List[str]:
+        """
+        Vectorized filter, see filter. Every check only runs on the words
+        the cheaper checks before it kept.
+        :param counts: Letter counts of the board, see board_profile.
+        :param letter_mask: Letter bitmask of the board.
+        :param bigrams: Bigram bitset of the board.
+        :return: The words kept, in the dictionary's order.
+        """
+        kept = numpy.flatnonzero(
+            (self._letter_masks & numpy.uint32(~letter_mask & 0xffffffff))
+            == 0
+        )
+        kept = kept[(self._counts[kept] <= numpy.array(counts, numpy.uint8))
+                    .all(axis=1)]
+        board_bigrams = numpy.array(
+            [bigrams >> 64 * i & 0xffffffffffffffff
+             for i in range(BIGRAM_WORDS)], numpy.uint64
+        )
+        kept = kept[((self._bigrams[kept] & ~board_bigrams) == 0)
+                    .all(axis=1)]
+        return [self._words[i] for i in kept]
+
+    def candidates(self, board: boggle_solver.BOARD_TYPE
+                   ) -> boggle_solver.WordIndex:
+        """
+        Returns the words that pass the board's precheck as an index, to
+        pass to the solvers in place of the dictionary. Without NumPy, the
+        dictionary's own index.
+        :param board: Boggle board.
+        :return: As described.
+        """
+        if numpy is None:
+            return self._index
+        return boggle_solver.WordIndex(self.filter(board))
@@ -0,0 +1,167 @@
+"""
+Background pre-generation of solved boards.
+A worker thread keeps a bounded queue of randomized boards that are already
+solved, so starting a new round only has to pop the next one. A worker that
+fails queues its error instead, which get raises.
+"""
+import queue
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Union
+
+import boggle_board_randomizer
+import boggle_solver
+from boggle_solution_cache import SolutionCache
+
+DEFAULT_DEPTH = 3
+
+
+class BoardPipeline:
+    """
+    Bounded queue of solved boards filled by background worker threads.
+    """
+    _ready: "queue.Queue[Union[boggle_solver.BoardSolution, Exception]]"
+    _produced: int  # Boards solved and queued by the workers.
+    _consumed: int  # Boards handed out by get.
+    _starved: int  # Calls to get that found the queue empty.
+    _starved_time: float  # Total seconds get waited on an empty queue.
+
+    def __init__(self, words: Iterable[str], depth: int = DEFAULT_DEPTH,
+                 dice_list: List[List[str]] = boggle_board_randomizer.LETTERS,
+                 workers: int = 1, rows: Optional[int] = None,
+                 cols: Optional[int] = None,
+                 cache: Optional[SolutionCache] = None):
+        """
+        :param words: Words iterable or WordIndex to solve the boards with.
+        :param depth: How many solved boards to keep ready.
+        :param dice_list: Dice to randomize the boards with.
+        :param workers: Number of worker threads.
+        :param rows: Number of board rows, see randomize_board.
+        :param cols: Number of board columns, see randomize_board.
+        :param cache: Cache the boards are looked up in before being solved,
+        and stored in once solved. It must hold solutions of the same words.
+        """
+        if depth < 1:
+            raise ValueError("Pipeline depth must be at least 1.")
+        self._words = boggle_solver.as_word_index(words)
+        self._dice_list = dice_list
+        self._rows = rows
+        self._cols = cols
+        self._cache = cache
+        self._ready = queue.Queue(maxsize=depth)
+        self._stop_event = threading.Event()
+        self._workers = [
+            threading.Thread(target=self._work, daemon=True,
+                             name="boggle-pregen-{0}".format(i))
+            for i in range(workers)
+        ]
+        self._lock = threading.Lock()
+        self._produced = 0
+        self._consumed = 0
+        self._starved = 0
+        self._starved_time = 0.0
+
+    def _work(self) -> None:
+        """
+        Worker thread loop: randomizes and solves boards until stopped. On
+        an error, queues it and stops, so that get raises it rather than
+        waiting forever for a board.
+        :return:
+        """
+        while not self._stop_event.is_set():
+            board = boggle_board_randomizer.randomize_board(
+                self._dice_list, self._rows, self._cols
+            )
+            try:
+                if self._cache is not None:
+                    solution = self._cache.solve(board)
+                else:
+                    solution = boggle_solver.BoardSolution.solve(board,
+                                                                 self._words)
+            except Exception as error:
+                self._put(error)
+                return
+            if self._put(solution):
+                with self._lock:
+                    self._produced += 1
+
+    def _put(self, item: Union[boggle_solver.BoardSolution, Exception]
+             ) -> bool:
+        """
+        Queues a solved board or a worker error, waiting for room in the
+        queue until the pipeline is stopped.
+        :param item: The board's solution or the error.
+        :return: True if it was queued, False if the pipeline was stopped.
+        """
+        while not self._stop_event.is_set():
+            try:
+                self._ready.put(item, timeout=0.1)
+            except queue.Full:
+                continue
+            return True
+        return False
+
+    def start(self) -> "BoardPipeline":
+        """
+        Starts the worker threads.
+        :return: The pipeline itself.
+        """
+        for worker in self._workers:
+            worker.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Stops the worker threads. Boards already queued can still be taken.
+        :return:
+        """
+        self._stop_event.set()
+        for worker in self._workers:
+            if worker.is_alive():
+                worker.join()
+
+    def get(self, timeout: Optional[float] = None
+            ) -> boggle_solver.BoardSolution:
+        """
+        Pops the next solved board, waiting for the workers if none is ready.
+        :param timeout: Seconds to wait at most, None to wait forever.
+        :return: The solution of the board, see BoardSolution.get_board.
+        :raises queue.Empty: If no board was ready in time.
+        :raises Exception: The error a worker failed with, raised by this and
+        every later call once the boards solved before it are taken.
+        """
+        try:
+            solution = self._ready.get_nowait()
+        except queue.Empty:
+            start = time.perf_counter()
+            try:
+                solution = self._ready.get(timeout=timeout)
+            finally:
+                with self._lock:
+                    self._starved += 1
+                    self._starved_time += time.perf_counter() - start
+        if isinstance(solution, Exception):
+            # Left in the queue for the next callers, which may be waiting.
+            try:
+                self._ready.put_nowait(solution)
+            except queue.Full:
+                pass
+            raise solution
+        with self._lock:
+            self._consumed += 1
+        return solution
+
+    def get_stats(self) -> Dict[str, Union[int, float]]:
+        """
+        Returns the pipeline counters: depth, ready (boards queued now),
+        produced, consumed, starved (gets that had to wait) and starved_time
+        (seconds waited).
+        :return: As described.
+        """
+        with self._lock:
+            return {"depth": self._ready.maxsize,
+                    "ready": self._ready.qsize(),
+                    "produced": self._produced,
+                    "consumed": self._consumed,
+                    "starved": self._starved,
+                    "starved_time": self._starved_time}
@@ -0,0 +1,349 @@
+"""
+Headless game server.
+Runs many BoggleModel sessions in one asyncio event loop. Clients connect
+over TCP (or a unix socket) and exchange one JSON object per line.
+
+Requests, each may carry an "id" that is echoed back in the response:
+    {"op": "new"}                           -> {"game": 1, "board": [...]}
+    {"op": "start", "game": 1}              -> {"game": 1, "time": "3:00"}
+    {"op": "submit", "game": 1, "path": [[0, 0], [0, 1], ...]}
+                                            -> {"game": 1, "ok": true,
+                                                "score": 9, "percentage": ...}
+    {"op": "state", "game": 1}              -> {"game": 1, "board": [...], ...}
+    {"op": "close", "game": 1}              -> {"game": 1, "closed": true}
+    {"op": "stats"}                         -> server counters
+    {"op": "metrics"}                       -> {"metrics": "..."}, Prometheus
+                                                text, see boggle_metrics
+Errors are answered with {"error": "..."}. When a round's time is up the
+server pushes {"event": "round_over", "game": 1, "score": ..., "words": [...]}
+and the game waits on a new board for the next "start".
+
+Round timers of all games are driven by a single timer wheel task, and all
+games share the process-wide dictionary index and one pre-generation
+pipeline of solved boards.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import queue
+from typing import Any, Dict, Optional
+
+import boggle_board_randomizer
+import boggle_dict_index
+import boggle_metrics
+import boggle_solver
+from boggle_model import BoggleModel
+from boggle_pregen import BoardPipeline
+from boggle_solution_cache import SolutionCache
+from boggle_timer import TimerHandle, TimerWheel
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+PREGEN_DEPTH = 8
+MESSAGE_TYPE = Dict[str, Any]
+
+
+class ProtocolError(Exception):
+    """
+    A client request that can't be served. Its message is sent back to the
+    client.
+    """
+
+
+class _Session:
+    """
+    A game played over a connection.
+    """
+
+    def __init__(self, game_id: int, model: BoggleModel,
+                 writer: asyncio.StreamWriter):
+        self.game_id = game_id
+        self.model = model
+        self.writer = writer
+        self.timer: Optional[TimerHandle] = None  # End of the current round.
+
+
+class BoggleServer:
+    """
+    Serves boggle games to many clients from one event loop.
+    """
+    _sessions: Dict[int, _Session]
+
+    def __init__(self, board_size: int = boggle_board_randomizer.BOARD_SIZE,
+                 pregen_depth: int = PREGEN_DEPTH,
+                 round_duration: int = BoggleModel.GAME_DURATION,
+                 cache_path: Optional[str] = None):
+        self._words = boggle_dict_index.get_index()
+        self._cache = (None if cache_path is None
+                       else SolutionCache(self._words, cache_path))
+        self._board_size = board_size
+        self._dice_list = boggle_board_randomizer.dice_for_size(board_size)
+        self._boards = BoardPipeline(
+            self._words, depth=pregen_depth, dice_list=self._dice_list,
+            rows=board_size, cols=board_size, cache=self._cache
+        )
+        self._round_duration = round_duration
+        self._round_timers = TimerWheel(clock=BoggleModel.clock)
+        self._sessions = {}
+        self._game_ids = itertools.count(1)
+        self._last_solution: Optional[boggle_solver.BoardSolution] = None
+        self._rounds_finished = 0
+        self._timers_task: Optional[asyncio.Task] = None
+
+    def _take_solution(self, current: Optional[boggle_solver.BOARD_TYPE]
+                       = None) -> Optional[boggle_solver.BoardSolution]:
+        """
+        Returns a solved board for a new round without waiting: the next
+        fresh board of the pipeline or, only when none is ready, the last
+        board dealt again (solutions are immutable, so games created while
+        the pipeline is behind share it).
+        :param current: Board the game just played, never dealt to it again.
+        None for a new game.
+        :return: As described, None if there is no such board.
+        """
+        try:
+            self._last_solution = self._boards.get(timeout=0)
+        except queue.Empty:
+            if (
+                    self._last_solution is None
+                    or self._last_solution.get_board() == current
+            ):
+                return None
+        return self._last_solution
+
+    async def _next_solution(self) -> boggle_solver.BoardSolution:
+        """
+        Returns a solved board for a new round, see _take_solution. Waits
+        for the pipeline only before the first board is solved.
+        :return: As described.
+        """
+        solution = self._take_solution()
+        if solution is None:
+            loop = asyncio.get_running_loop()
+            solution = await loop.run_in_executor(None, self._boards.get)
+            self._last_solution = solution
+        return solution
+
+    def _get_session(self, request: MESSAGE_TYPE,
+                     writer: asyncio.StreamWriter) -> _Session:
+        """
+        Returns the session a request refers to.
+        :param request: The request.
+        :param writer: The connection the request came from.
+        :return: As described.
+        """
+        game_id = request.get("game")
+        # Only ints are hashable game IDs; a list or object would raise.
+        session = (self._sessions.get(game_id)
+                   if type(game_id) is int else None)
+        if session is None or session.writer is not writer:
+            raise ProtocolError("Unknown game.")
+        return session
+
+    def _end_round(self, session: _Session) -> None:
+        """
+        Scheduler callback ending a session's round: reports the result to
+        the client and installs the next board.
+        :param session: The session.
+        :return:
+        """
+        model = session.model
+        event = {"event": "round_over", "game": session.game_id,
+                 "score": model.get_score(),
+                 "percentage": model.current_score_percentage(),
+                 "words": model.get_words_found_list()}
+        session.timer = None
+        self._rounds_finished += 1
+        solution = self._take_solution(model.get_board())
+        if solution is None:
+            # The pipeline is behind and the only board at hand is the one
+            # just played: deal a new board, solved by the model in the
+            # background.
+            model.stop_game(boggle_board_randomizer.randomize_board(
+                self._dice_list, self._board_size, self._board_size
+            ))
+        else:
+            model.stop_game(solution.get_board(), solution)
+        self._send(session.writer, event)
+
+    @staticmethod
+    def _send(writer: asyncio.StreamWriter, message: MESSAGE_TYPE) -> None:
+        """
+        Queues a message to a client.
+        :param writer: The client connection.
+        :param message: The message.
+        :return:
+        """
+        if not writer.is_closing():
+            writer.write(json.dumps(message).encode() + b"\n")
+
+    async def _handle_request(self, request: MESSAGE_TYPE,
+                              writer: asyncio.StreamWriter) -> MESSAGE_TYPE:
+        """
+        Serves one request.
+        :param request: The request.
+        :param writer: The connection the request came from.
+        :return: The response.
+        """
+        op = request.get("op")
+        if op == "new":
+            solution = await self._next_solution()
+            game_id = next(self._game_ids)
+            model = BoggleModel(solution.get_board(), solution,
+                                self._round_duration)
+            self._sessions[game_id] = _Session(game_id, model, writer)
+            return {"game": game_id, "board": model.get_board()}
+        if op == "stats":
+            return self.get_stats()
+        if op == "metrics":
+            return {"metrics": boggle_metrics.export_prometheus()}
+        session = self._get_session(request, writer)
+        model = session.model
+        if op == "start":
+            if model.is_game_stopped():
+                model.start_game()
+                session.timer = self._round_timers.schedule(
+                    model.get_deadline(), lambda: self._end_round(session)
+                )
+            return {"game": session.game_id, "board": model.get_board(),
+                    "time": model.get_time()}
+        if op == "submit":
+            if model.is_game_stopped():
+                raise ProtocolError("Round is not running.")
+            try:
+                path = [(int(row), int(col)) for row, col in request["path"]]
+                if any(row < 0 or col < 0 for row, col in path):
+                    raise IndexError
+                is_submit_succeeded = model.submit_path(path)
+            except (KeyError, TypeError, ValueError, IndexError,
+                    OverflowError):
+                # OverflowError: int() of an infinite JSON number.
+                raise ProtocolError("Invalid path.")
+            return {"game": session.game_id, "ok": is_submit_succeeded,
+                    "score": model.get_score(),
+                    "percentage": model.current_score_percentage()}
+        if op == "state":
+            return {"game": session.game_id, "board": model.get_board(),
+                    "running": not model.is_game_stopped(),
+                    "time": model.get_time(),
+                    "score": model.get_score(),
+                    "words": model.get_words_found_list()}
+        if op == "close":
+            self._close_session(session)
+            return {"game": session.game_id, "closed": True}
+        raise ProtocolError("Unknown op.")
+
+    def _close_session(self, session: _Session) -> None:
+        """
+        Forgets a session and cancels its round timer.
+        :param session: The session.
+        :return:
+        """
+        if session.timer is not None:
+            session.timer.cancel()
+        del self._sessions[session.game_id]
+
+    async def _handle_client(self, reader: asyncio.StreamReader,
+                             writer: asyncio.StreamWriter) -> None:
+        """
+        Serves a client connection until it closes.
+        :param reader: The connection's reader.
+        :param writer: The connection's writer.
+        :return:
+        """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request: MESSAGE_TYPE = {}
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ProtocolError("Request must be an object.")
+                    response = await self._handle_request(request, writer)
+                except ProtocolError as error:
+                    response = {"error": str(error)}
+                except json.JSONDecodeError:
+                    response = {"error": "Invalid JSON."}
+                # Only an object has an id; "id" in "myid" would be true.
+                if isinstance(request, dict) and "id" in request:
+                    response["id"] = request["id"]
+                self._send(writer, response)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for session in [s for s in self._sessions.values()
+                            if s.writer is writer]:
+                self._close_session(session)
+            writer.close()
+
+    def get_stats(self) -> MESSAGE_TYPE:
+        """
+        Returns the server counters.
+        :return: As described.
+        """
+        running = sum(1 for s in self._sessions.values()
+                      if s.timer is not None)
+        return {"games": len(self._sessions), "running": running,
+                "rounds_finished": self._rounds_finished,
+                "timers": self._round_timers.get_stats(),
+                "boards": self._boards.get_stats(),
+                "dictionary": boggle_dict_index.REGISTRY.get_stats(),
+                "cache": (None if self._cache is None
+                          else self._cache.get_stats())}
+
+    async def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                    unix_path: Optional[str] = None) -> None:
+        """
+        Serves clients until cancelled.
+        :param host: TCP host to listen on.
+        :param port: TCP port to listen on.
+        :param unix_path: Unix socket path to listen on instead of TCP.
+        :return:
+        """
+        self._boards.start()
+        self._timers_task = asyncio.get_running_loop().create_task(
+            self._round_timers.run()
+        )
+        if unix_path is not None:
+            server = await asyncio.start_unix_server(self._handle_client,
+                                                     unix_path)
+        else:
+            server = await asyncio.start_server(self._handle_client, host,
+                                                port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self._timers_task.cancel()
+            self._boards.stop()
+            if self._cache is not None:
+                self._cache.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Headless boggle server.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", help="Unix socket path, instead of TCP")
+    parser.add_argument("--size", type=int,
+                        default=boggle_board_randomizer.BOARD_SIZE,
+                        help="Board size (4, 5 or 6)")
+    parser.add_argument("--duration", type=int,
+                        default=BoggleModel.GAME_DURATION,
+                        help="Round duration in seconds")
+    parser.add_argument("--cache", help="SQLite file caching solved boards")
+    args = parser.parse_args()
+    server = BoggleServer(args.size, round_duration=args.duration,
+                          cache_path=args.cache)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""
+Persistent cache of solved boards.
+Solutions are kept in a SQLite file keyed by the board's signature: the
+board read row by row, canonicalised under the 8 rotations and reflections of
+the board, so that symmetric boards share one entry. Paths are stored on the
+canonical board and mapped back onto the board they are asked for. Every
+path of every word is stored along with the best ones, so a restored
+solution answers word_for_path and get_word_paths like a solved one.
+The cache is bound to one dictionary; opening it with other words drops the
+stored solutions. Least recently used entries are evicted past the entry and
+size caps.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import boggle_dict_index
+import boggle_solver
+
+DEFAULT_PATH = "boggle_solutions.sqlite"
+DEFAULT_MAX_ENTRIES = 100000
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Version of the stored data, part of the stamp checked on opening: data of
+# another version is dropped.
+DATA_VERSION = 2
+
+# Cell permutation: position i of the transformed board holds cell perm[i]
+# of the original board.
+PERMUTATION_TYPE = Tuple[int, ...]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS solutions (
+    signature TEXT PRIMARY KEY,
+    data BLOB NOT NULL,
+    max_score INTEGER NOT NULL,
+    last_used INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS solutions_last_used ON solutions (last_used);
+"""
+
+
+def _symmetries(rows: int, cols: int
+                ) -> List[Tuple[int, int, PERMUTATION_TYPE]]:
+    """
+    Returns the 8 rotations and reflections of a rows x cols board, as the
+    transposed board or not, with its rows and columns flipped or not.
+    :param rows: Number of board rows.
+    :param cols: Number of board columns.
+    :return: List of (rows, cols, permutation) of the transformed boards.
+    """
+    transforms = []
+    for transpose in (False, True):
+        out_rows, out_cols = (cols, rows) if transpose else (rows, cols)
+        for flip_rows in (False, True):
+            for flip_cols in (False, True):
+                perm = []
+                for row in range(out_rows):
+                    for col in range(out_cols):
+                        src_row, src_col = (col, row) if transpose \
+                            else (row, col)
+                        if flip_rows:
+                            src_row = rows - 1 - src_row
+                        if flip_cols:
+                            src_col = cols - 1 - src_col
+                        perm.append(src_row * cols + src_col)
+                transforms.append((out_rows, out_cols, tuple(perm)))
+    return transforms
+
+
+def _signature_of(rows: int, cols: int, faces: List[str]) -> str:
+    """
+    Returns the signature text of a board read row by row.
+    :param rows: Number of board rows.
+    :param cols: Number of board columns.
+    :param faces: Faces of the cells, row by row.
+    :return: As described.
+    """
+    return "{0}x{1}:{2}".format(rows, cols, ",".join(faces))
+
+
+def board_signature(board: boggle_solver.BOARD_TYPE
+                    ) -> Tuple[str, PERMUTATION_TYPE]:
+    """
+    Returns the canonical signature of a board: the smallest signature of
+    its rotations and reflections.
+    :param board: Boggle board.
+    :return: Tuple of the signature and the permutation from the board to
+    the canonical board (see PERMUTATION_TYPE).
+    """
+    rows, cols = len(board), len(board[0])
+    faces = [face for row in board for face in row]
+    return min(
+        (_signature_of(out_rows, out_cols, [faces[i] for i in perm]), perm)
+        for out_rows, out_cols, perm in _symmetries(rows, cols)
+    )
+
+
+def dictionary_stamp(words: Iterable[str]) -> str:
+    """
+    Returns a text identifying a dictionary, to tell if cached solutions
+    were solved with it.
+    :param words: Words iterable or WordIndex.
+    :return: As described.
+    """
+    if isinstance(words, boggle_dict_index.MappedWordIndex):
+        return "index:{0}:{1}:{2}".format(*words.get_stamp())
+    digest = hashlib.sha1()
+    for word in sorted(words):
+        digest.update(word.encode() + b"\n")
+    return "words:" + digest.hexdigest()
+
+
+class SolutionCache:
+    """
+    Persistent cache of board solutions in a SQLite file. Safe to share
+    between threads.
+    """
+    _entries: int  # Entries stored.
+    _bytes: int  # Size of the stored solutions.
+    _tick: int  # Last use stamp handed out, orders the entries for LRU.
+    _hits: int
+    _misses: int
+    _evictions: int
+
+    def __init__(self, words: Iterable[str], path: str = DEFAULT_PATH,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        :param words: Words iterable or WordIndex the solutions are solved
+        with.
+        :param path: Path of the SQLite file, ":memory:" for a cache that
+        is not persisted.
+        :param max_entries: Most solutions kept.
+        :param max_bytes: Most bytes of solution data kept.
+        """
+        self._words = boggle_solver.as_word_index(words)
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.executescript(_SCHEMA)
+            stamp = "v{0}:{1}".format(DATA_VERSION,
+                                      dictionary_stamp(self._words))
+            row = self._connection.execute(
+                "SELECT value FROM meta WHERE key = 'dictionary'"
+            ).fetchone()
+            if row is None or row[0] != stamp:
+                self._connection.execute("DELETE FROM solutions")
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO meta VALUES ('dictionary', ?)",
+                    (stamp,)
+                )
+        self._entries, self._bytes, self._tick = self._connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0), "
+            "COALESCE(MAX(last_used), 0) FROM solutions"
+        ).fetchone()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, board: boggle_solver.BOARD_TYPE
+            ) -> Optional[boggle_solver.BoardSolution]:
+        """
+        Looks a board's solution up.
+        :param board: Boggle board.
+        :return: The board's solution, None if it is not cached.
+        """
+        signature, perm = board_signature(board)
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT data FROM solutions WHERE signature = ?",
+                (signature,)
+            ).fetchone()
+            if row is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            self._tick += 1
+            with self._connection:
+                self._connection.execute(
+                    "UPDATE solutions SET last_used = ? WHERE signature = ?",
+                    (self._tick, signature)
+                )
+        data = json.loads(row[0])
+        cells = {word: bytes(perm[cell] for cell in canonical_cells)
+                 for word, canonical_cells in data["cells"].items()}
+        if "paths" not in data:
+            return boggle_solver.BoardSolution(board, cells)
+        path_words: Dict[boggle_solver.CELLS_TYPE, str] = {}
+        word_paths: Dict[str, List[boggle_solver.WORD_PATH_TYPE]] = {}
+        for word, canonical_paths in data["paths"].items():
+            # Mapped onto another rotation or reflection, the paths are no
+            # longer in board scanning order, which is the order of their
+            # cells (neighbours are walked in increasing order).
+            paths = word_paths[word] = []
+            for path in sorted(bytes(perm[cell] for cell in canonical_cells)
+                               for canonical_cells in canonical_paths):
+                mask = 0
+                for cell in path:
+                    mask |= 1 << cell
+                paths.append((mask, path))
+                path_words[path] = word
+        if len(path_words) < boggle_solver.MAX_PATH_WORDS:
+            # The best path is the first of the longest in scanning order,
+            # as solve_cells picks it on this board.
+            for word, paths in word_paths.items():
+                cells[word] = max((path for _, path in paths), key=len)
+        # Otherwise the solve stopped recording at MAX_PATH_WORDS paths, so
+        # some paths are missing: the stored best paths are kept, and the
+        # solution is restored with as many paths, which marks it truncated
+        # again.
+        return boggle_solver.BoardSolution(board, cells, path_words,
+                                           word_paths)
+
+    def put(self, solution: boggle_solver.BoardSolution) -> None:
+        """
+        Stores a solution, evicting the least recently used ones past the
+        caps.
+        :param solution: Solution solved with the cache's words.
+        :return:
+        """
+        signature, perm = board_signature(solution.get_board())
+        to_canonical = {cell: i for i, cell in enumerate(perm)}
+        record = {"cells": {word: [to_canonical[cell] for cell in cells]
+                            for word, cells in solution.get_cells().items()}}
+        try:
+            record["paths"] = {
+                word: [[to_canonical[cell] for cell in cells]
+                       for _, cells in solution.get_word_cells(word)]
+                for word in solution.get_words()
+            }
+        except LookupError:
+            # Not recorded by the solve, stored without
+            pass
+        data = json.dumps(record, separators=(",", ":")).encode()
+        with self._lock, self._connection:
+            old = self._connection.execute(
+                "SELECT LENGTH(data) FROM solutions WHERE signature = ?",
+                (signature,)
+            ).fetchone()
+            if old is not None:
+                self._entries -= 1
+                self._bytes -= old[0]
+            self._tick += 1
+            self._connection.execute(
+                "INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?)",
+                (signature, data, solution.max_score(), self._tick)
+            )
+            self._entries += 1
+            self._bytes += len(data)
+            self._evict()
+
+    def _evict(self) -> None:
+        """
+        Deletes the least recently used entries until the cache is within
+        its caps. Called with the lock held, in a transaction.
+        :return:
+        """
+        while self._entries > self._max_entries \
+                or self._bytes > self._max_bytes:
+            batch = max(1, self._entries - self._max_entries)
+            rows = self._connection.execute(
+                "SELECT signature, LENGTH(data) FROM solutions "
+                "ORDER BY last_used LIMIT ?", (batch,)
+            ).fetchall()
+            if not rows:
+                break
+            self._connection.executemany(
+                "DELETE FROM solutions WHERE signature = ?",
+                [(signature,) for signature, _ in rows]
+            )
+            self._entries -= len(rows)
+            self._bytes -= sum(size for _, size in rows)
+            self._evictions += len(rows)
+
+    def solve(self, board: boggle_solver.BOARD_TYPE
+              ) -> boggle_solver.BoardSolution:
+        """
+        Returns a board's solution from the cache, solving and storing it
+        if it is not cached.
+        :param board: Boggle board.
+        :return: The board's solution.
+        """
+        solution = self.get(board)
+        if solution is None:
+            solution = boggle_solver.BoardSolution.solve(board, self._words)
+            self.put(solution)
+        return solution
+
+    def get_stats(self) -> Dict[str, Union[int, float]]:
+        """
+        Returns the cache counters: entries, bytes, hits, misses and
+        evictions.
+        :return: As described.
+        """
+        with self._lock:
+            return {"entries": self._entries,
+                    "bytes": self._bytes,
+                    "hits": self._hits,
+                    "misses": self._misses,
+                    "evictions": self._evictions}
+
+    def clear(self) -> None:
+        """
+        Deletes every stored solution.
+        :return:
+        """
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM solutions")
+            self._entries = 0
+            self._bytes = 0
+
+    def close(self) -> None:
+        """
+        Closes the SQLite file. The cache can't be used afterwards.
+        :return:
+        """
+        with self._lock:
+            self._connection.close()
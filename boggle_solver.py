@@ -0,0 +1,586 @@
+import bisect
+import functools
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import boggle_metrics
+
+BOARD_TYPE = List[List[str]]
+PATH_TYPE = List[Tuple[int, int]]
+SOLUTION_TYPE = Dict[str, PATH_TYPE]
+CELLS_TYPE = bytes  # Path as a sequence of cell indices (row * cols + col),
+# which limits boards to 256 cells.
+NEIGHBOURS_TYPE = Tuple[Tuple[int, ...], ...]
+# Memo of a search's tile transitions: packed (lo, prefix length, tile ID)
+# to the state it leads to, the range of the longer prefix and whether it is
+# a word. See TileIndex.
+TRANSITIONS_TYPE = Dict[int, Tuple[int, int, bool]]
+# Path as the bitmask of its cells and its cells, in order.
+WORD_PATH_TYPE = Tuple[int, CELLS_TYPE]
+
+# Most word paths a solve records for path lookups and the paths of every
+# word, see BoardSolution.word_for_path and BoardSolution.get_word_paths.
+# Bounds the memory of path-dense boards.
+MAX_PATH_WORDS = 100000
+
+# Most tile transitions a search memoizes, see TileIndex.step. An entry takes
+# about 150 bytes, so the memo of a search stays under 8 MB; a 6x6 board
+# takes up to about 15000 entries (2 MB), a 4x4 board about 2000. The memo
+# is freed when the search ends.
+MAX_TILE_TRANSITIONS = 50000
+
+# Sorts after any letter a dictionary word may contain, so that
+# prefix + _HIGH_SENTINEL bounds every word starting with prefix.
+_HIGH_SENTINEL = "\U0010ffff"
+
+
+class WordIndex:
+    """
+    Sorted table of words answering exact-word and prefix queries by
+    bisection. Every prefix of the dictionary corresponds to a contiguous
+    range of the table, so the table acts as an implicit trie: descending
+    one letter narrows the current range instead of following a node.
+    """
+    _words: List[str]
+    _tile_index: Optional["TileIndex"] = None  # Built on first use.
+
+    def __init__(self, words: Iterable[str]):
+        self._words = sorted(set(words))
+
+    def __len__(self) -> int:
+        return len(self._words)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._words)
+
+    def __contains__(self, word: object) -> bool:
+        if not isinstance(word, str):
+            return False
+        i = bisect.bisect_left(self._words, word)
+        return i < len(self._words) and self._words[i] == word
+
+    def word_at(self, i: int) -> str:
+        """
+        Returns the i-th word of the sorted table.
+        :param i: Position in the table.
+        :return: As described.
+        """
+        return self._words[i]
+
+    def word_length(self, i: int) -> int:
+        """
+        Returns the length of the i-th word of the sorted table.
+        :param i: Position in the table.
+        :return: As described.
+        """
+        return len(self._words[i])
+
+    def prefix_range(self, prefix: str, lo: int = 0,
+                     hi: Optional[int] = None) -> Tuple[int, int]:
+        """
+        Returns the [lo, hi) range of the table holding the words that start
+        with prefix. The search may be restricted to a range already known to
+        hold the words of a shorter prefix.
+        :param prefix: Prefix to look for.
+        :param lo: Start of the range to search in.
+        :param hi: End of the range to search in (defaults to the table end).
+        :return: As described, an empty range if no word has the prefix.
+        """
+        if hi is None:
+            hi = len(self._words)
+        start = bisect.bisect_left(self._words, prefix, lo, hi)
+        end = bisect.bisect_left(self._words, prefix + _HIGH_SENTINEL,
+                                 start, hi)
+        return start, end
+
+    def has_prefix(self, prefix: str) -> bool:
+        """
+        Checks if any word in the table starts with prefix.
+        :param prefix: Prefix to look for.
+        :return: True/False
+        """
+        start, end = self.prefix_range(prefix)
+        return start < end
+
+    def get_tile_index(self) -> "TileIndex":
+        """
+        Returns the TileIndex walking this table, shared by every search on
+        it so tiles keep the same IDs.
+        :return: As described.
+        """
+        if self._tile_index is None:
+            self._tile_index = TileIndex(self)
+        return self._tile_index
+
+
+class TileIndex:
+    """
+    Walks a WordIndex tile by tile. A tile is a die face, one letter or
+    several ('QU', 'TH', 'IN'...), interned to a small integer ID.
+    A walk state is the range of the table holding the words that start with
+    the prefix walked so far. Since the first word of the range starts with
+    the prefix, (lo, len(prefix)) names it, and a search memoizes its
+    transitions on (lo, len(prefix), tile ID), see TRANSITIONS_TYPE: a step
+    that was taken before in the search, typically from a short prefix or a
+    branch that is pruned, is one dict lookup whatever the tile's length,
+    without building a string.
+    """
+    _tiles: List[str]  # Tile of every ID.
+    _tile_ids: Dict[str, int]
+
+    def __init__(self, index: WordIndex):
+        self._index = index
+        self._tiles = []
+        self._tile_ids = {}
+        self._tiles_lock = threading.Lock()
+
+    def get_index(self) -> WordIndex:
+        """
+        Getter method for the walked table.
+        :return:
+        """
+        return self._index
+
+    def get_tile(self, tile_id: int) -> str:
+        """
+        Returns the tile of an ID.
+        :param tile_id: ID of the tile.
+        :return: As described.
+        """
+        return self._tiles[tile_id]
+
+    def tile_ids(self, tiles: Iterable[str]) -> Tuple[int, ...]:
+        """
+        Returns the IDs of tiles, interning the new ones.
+        :param tiles: Tiles, e.g. the letters of every cell of a board.
+        :return: Tuple of their IDs.
+        """
+        ids = []
+        for tile in tiles:
+            tile_id = self._tile_ids.get(tile)
+            if tile_id is None:
+                with self._tiles_lock:
+                    tile_id = self._tile_ids.get(tile)
+                    if tile_id is None:
+                        if len(self._tiles) == 256:
+                            raise ValueError("Too many distinct tiles.")
+                        tile_id = len(self._tiles)
+                        self._tiles.append(tile)
+                        self._tile_ids[tile] = tile_id
+            ids.append(tile_id)
+        return tuple(ids)
+
+    def step(self, lo: int, hi: int, prefix: str, tile_id: int,
+             transitions: TRANSITIONS_TYPE) -> Tuple[int, int, bool]:
+        """
+        Returns the state reached by appending a tile to a prefix, and
+        memoizes it, up to MAX_TILE_TRANSITIONS transitions. Searches look
+        the memo up inline (the key of a step is transition_key(lo,
+        len(prefix), tile ID)) and call step on a miss. Prefixes are
+        followed up to 255 letters.
+        :param lo: Start of the prefix's range, 0 for the empty prefix.
+        :param hi: End of the prefix's range, len(index) for the empty
+        prefix.
+        :param prefix: The prefix walked so far.
+        :param tile_id: ID of the tile.
+        :param transitions: The search's memo.
+        :return: Tuple of the range of the words starting with the longer
+        prefix (empty if there is none) and whether that prefix is a word.
+        """
+        next_prefix = prefix + self._tiles[tile_id]
+        if len(next_prefix) > 255:
+            # Beyond what a memo key holds.
+            return lo, lo, False
+        next_lo, next_hi = self._index.prefix_range(next_prefix, lo, hi)
+        state = (next_lo, next_hi, next_lo < next_hi and
+                 self._index.word_length(next_lo) == len(next_prefix))
+        if len(transitions) < MAX_TILE_TRANSITIONS:
+            transitions[transition_key(lo, len(prefix), tile_id)] = state
+        return state
+
+
+def transition_key(lo: int, depth: int, tile_id: int) -> int:
+    """
+    Packs a TileIndex transition into its memo key.
+    :param lo: Start of the prefix's range.
+    :param depth: Length of the prefix, below 256.
+    :param tile_id: ID of the tile.
+    :return: As described.
+    """
+    return (lo << 8 | depth) << 8 | tile_id
+
+
+def as_word_index(words: Iterable[str]) -> WordIndex:
+    """
+    Returns words as a WordIndex, building one only if needed.
+    :param words: Words iterable or an already built index.
+    :return: As described.
+    """
+    if isinstance(words, WordIndex):
+        return words
+    return WordIndex(words)
+
+
+@functools.lru_cache(maxsize=None)
+def neighbour_table(rows: int, cols: int) -> NEIGHBOURS_TYPE:
+    """
+    Returns the neighbours of every cell of a rows x cols board, by cell
+    index. Neighbours are listed in the order the original backtracking
+    scanned them (row offset -1..1, then column offset -1..1), so searches
+    over the table find paths in the same order.
+    :param rows: Number of board rows.
+    :param cols: Number of board columns.
+    :return: Tuple of neighbour cell indices for every cell.
+    """
+    table = []
+    for row in range(rows):
+        for col in range(cols):
+            table.append(tuple(
+                (row + dx) * cols + col + dy
+                for dx in range(-1, 2)
+                for dy in range(-1, 2)
+                if (dx != 0 or dy != 0)
+                and 0 <= row + dx < rows and 0 <= col + dy < cols
+            ))
+    return tuple(table)
+
+
+class BoardGraph:
+    """
+    Board engine for the path searches. Cells are numbered row by row, the
+    letters and neighbours of every cell are precomputed, and a search tracks
+    its visited cells as an integer bitmask and its path as a list of cell
+    indices. Paths are converted to (row, col) lists only when returned.
+    """
+    _rows: int
+    _cols: int
+    _letters: Tuple[str, ...]  # Letter of every cell, by cell index.
+    _neighbours: NEIGHBOURS_TYPE
+
+    def __init__(self, board: BOARD_TYPE):
+        self._rows = len(board)
+        self._cols = len(board[0]) if board else 0
+        self._letters = tuple(letter for row in board for letter in row)
+        self._neighbours = neighbour_table(self._rows, self._cols)
+
+    def get_size(self) -> int:
+        """
+        Returns the number of cells on the board.
+        :return:
+        """
+        return self._rows * self._cols
+
+    def get_letters(self) -> Tuple[str, ...]:
+        """
+        Getter method for the letter of every cell.
+        :return:
+        """
+        return self._letters
+
+    def get_neighbours(self) -> NEIGHBOURS_TYPE:
+        """
+        Getter method for the neighbours of every cell.
+        :return:
+        """
+        return self._neighbours
+
+    def to_path(self, cells: Iterable[int]) -> PATH_TYPE:
+        """
+        Converts cell indices to a list of (row, col) coordinates.
+        :param cells: Cell indices.
+        :return: As described.
+        """
+        return [divmod(cell, self._cols) for cell in cells]
+
+
+def _solve_cells_helper(tiles: Tuple[int, ...], letters: Tuple[str, ...],
+                        neighbours: NEIGHBOURS_TYPE, tile_index: TileIndex,
+                        transitions: TRANSITIONS_TYPE,
+                        cell: int, word: str, visited: int,
+                        cells: List[int], lo: int, hi: int,
+                        solution: Dict[str, CELLS_TYPE],
+                        path_words: Optional[Dict[CELLS_TYPE, str]],
+                        word_paths: Optional[Dict[str, List[WORD_PATH_TYPE]]]
+                        ) -> None:
+    """
+    Helper function for solve_cells.
+    :param tiles: Tile ID of every cell.
+    :param letters: Letter of every cell.
+    :param neighbours: Neighbours of every cell.
+    :param tile_index: Words index walked by tiles.
+    :param transitions: The search's memoized transitions.
+    :param cell: Last cell of the current path.
+    :param word: The accumulated word.
+    :param visited: Bitmask of the cells on the current path.
+    :param cells: The current path currently backtracked.
+    :param lo: Start of the index range holding the words starting with word.
+    :param hi: End of that range.
+    :param solution: Best path found so far for every word.
+    :param path_words: Word of every path found so far, None to not record.
+    :param word_paths: Paths of every word found so far, None to not record.
+    :return:
+    """
+    depth = len(word)
+    for next_cell in neighbours[cell]:
+        if visited >> next_cell & 1:
+            continue
+        state = transitions.get((lo << 8 | depth) << 8 | tiles[next_cell])
+        if state is None:
+            state = tile_index.step(lo, hi, word, tiles[next_cell],
+                                    transitions)
+        next_lo, next_hi, is_word = state
+        if next_lo == next_hi:
+            # No word continues this way, prune the branch.
+            continue
+        # Strings are only built for the branches followed.
+        next_word = word + letters[next_cell]
+        next_visited = visited | 1 << next_cell
+        cells.append(next_cell)
+        if is_word:
+            _add_word(next_word, cells, next_visited, solution, path_words,
+                      word_paths)
+        _solve_cells_helper(tiles, letters, neighbours, tile_index,
+                            transitions, next_cell, next_word, next_visited,
+                            cells, next_lo, next_hi, solution, path_words,
+                            word_paths)
+        cells.pop()
+
+
+def _add_word(word: str, cells: List[int], visited: int,
+              solution: Dict[str, CELLS_TYPE],
+              path_words: Optional[Dict[CELLS_TYPE, str]],
+              word_paths: Optional[Dict[str, List[WORD_PATH_TYPE]]]) -> None:
+    """
+    Records a path holding a word, see _solve_cells_helper. Both records
+    share the path's bytes.
+    :param word: The word.
+    :param cells: Its path.
+    :param visited: Bitmask of its cells.
+    :param solution: Best path found so far for every word.
+    :param path_words: Word of every path found so far, None to not record.
+    Also bounds word_paths, which is recorded only along with it.
+    :param word_paths: Paths of every word found so far, None to not record.
+    :return:
+    """
+    key = bytes(cells)
+    found = solution.get(word)
+    if found is None or len(key) > len(found):
+        solution[word] = key
+    if path_words is not None and len(path_words) < MAX_PATH_WORDS:
+        path_words[key] = word
+        if word_paths is not None:
+            paths = word_paths.get(word)
+            if paths is None:
+                word_paths[word] = [(visited, key)]
+            else:
+                paths.append((visited, key))
+
+
+@boggle_metrics.timed("solve")
+def solve_cells(graph: BoardGraph, words: Iterable[str],
+                path_words: Optional[Dict[CELLS_TYPE, str]] = None,
+                word_paths: Optional[Dict[str, List[WORD_PATH_TYPE]]] = None
+                ) -> Dict[str, CELLS_TYPE]:
+    """
+    Like solve_board, but returns the paths as cell indices of the graph.
+    The board is walked by tile (see TileIndex), so multi-letter faces cost
+    the same as single letters.
+    :param graph: Board engine of the board.
+    :param words: Words iterable or WordIndex.
+    :param path_words: If given, filled with the word of every path on the
+    board that holds a word, up to MAX_PATH_WORDS paths.
+    :param word_paths: If given along with path_words, filled with every
+    path of every word, in board scanning order, for the paths recorded in
+    path_words.
+    :return: Dictionary mapping each word to its path.
+    """
+    index = as_word_index(words)
+    tile_index = index.get_tile_index()
+    letters, neighbours = graph.get_letters(), graph.get_neighbours()
+    tiles = tile_index.tile_ids(letters)
+    transitions: TRANSITIONS_TYPE = {}
+    solution: Dict[str, CELLS_TYPE] = {}
+    for cell in range(graph.get_size()):
+        lo, hi, is_word = tile_index.step(0, len(index), "", tiles[cell],
+                                          transitions)
+        if lo < hi:
+            if is_word:
+                _add_word(letters[cell], [cell], 1 << cell, solution,
+                          path_words, word_paths)
+            _solve_cells_helper(tiles, letters, neighbours, tile_index,
+                                transitions, cell, letters[cell], 1 << cell,
+                                [cell], lo, hi, solution, path_words,
+                                word_paths)
+    return solution
+
+
+def solve_board(board: BOARD_TYPE, words: Iterable[str]) -> SOLUTION_TYPE:
+    """
+    Walks every path on the board once, pruning paths whose letters are not
+    a prefix of any word, and returns the highest score path of every word
+    from the words list that appears on the board.
+    For every word the chosen path is the same one the per-word search in
+    boggle_utils.max_score_paths returns: the first path, in board scanning
+    order, among the longest paths spelling the word.
+    :param board: Boggle board.
+    :param words: Words iterable or WordIndex.
+    :return: Dictionary mapping each word to its path.
+    """
+    graph = BoardGraph(board)
+    return {word: graph.to_path(cells)
+            for word, cells in solve_cells(graph, words).items()}
+
+
+class BoardSolution:
+    """
+    Full solution of a board: the highest score path of every word that
+    appears on it, and when solved here, every path of every word.
+    """
+    _board: BOARD_TYPE
+    _cells: Dict[str, CELLS_TYPE]  # Paths as cell indices.
+    _paths: Optional[SOLUTION_TYPE]  # Paths as coordinates, built on demand.
+    _scores: Dict[str, int]  # Best score of every word.
+    _max_score: int
+    _path_words: Optional[Dict[CELLS_TYPE, str]]  # Word of every path
+    # holding a word, None if not recorded or truncated at MAX_PATH_WORDS.
+    _word_paths: Optional[Dict[str, List[WORD_PATH_TYPE]]]  # Paths of every
+    # word, None if not recorded. Holds only the first MAX_PATH_WORDS paths
+    # on path-dense boards.
+    _all_word_paths: bool  # Whether _word_paths holds every path.
+
+    def __init__(self, board: BOARD_TYPE, cells: Dict[str, CELLS_TYPE],
+                 path_words: Optional[Dict[CELLS_TYPE, str]] = None,
+                 word_paths: Optional[Dict[str, List[WORD_PATH_TYPE]]] = None):
+        self._board = board
+        self._cells = cells
+        self._paths = None
+        if path_words is not None and len(path_words) >= MAX_PATH_WORDS:
+            path_words = None
+        self._path_words = path_words
+        self._word_paths = word_paths
+        self._all_word_paths = word_paths is not None and \
+            path_words is not None
+        self._cols = len(board[0]) if board else 0
+        self._scores = {word: len(word_cells) ** 2
+                        for word, word_cells in cells.items()}
+        self._max_score = sum(self._scores.values())
+
+    @classmethod
+    def solve(cls, board: BOARD_TYPE, words: Iterable[str]
+              ) -> "BoardSolution":
+        """
+        Solves the board against the words (see solve_board).
+        :param board: Boggle board.
+        :param words: Words iterable or WordIndex.
+        :return: The board's solution.
+        """
+        path_words: Dict[CELLS_TYPE, str] = {}
+        word_paths: Dict[str, List[WORD_PATH_TYPE]] = {}
+        cells = solve_cells(BoardGraph(board), words, path_words, word_paths)
+        return cls(board, cells, path_words, word_paths)
+
+    def get_board(self) -> BOARD_TYPE:
+        """
+        Getter method for the solved board.
+        :return:
+        """
+        return self._board
+
+    def get_cells(self) -> Dict[str, CELLS_TYPE]:
+        """
+        Getter method for the word to highest score path mapping, with the
+        paths as cell indices.
+        :return:
+        """
+        return self._cells
+
+    def get_paths(self) -> SOLUTION_TYPE:
+        """
+        Getter method for the word to highest score path mapping.
+        :return:
+        """
+        if self._paths is None:
+            graph = BoardGraph(self._board)
+            self._paths = {word: graph.to_path(cells)
+                           for word, cells in self._cells.items()}
+        return self._paths
+
+    def get_words(self) -> List[str]:
+        """
+        Returns the words appearing on the board.
+        :return:
+        """
+        return list(self._cells)
+
+    def word_for_path(self, path: PATH_TYPE) -> Optional[str]:
+        """
+        Returns the word a path holds by one lookup in the paths recorded by
+        the solve. For every path it covers, the answer is the one
+        boggle_utils.is_valid_path gives against the words the board was
+        solved with.
+        :param path: List of coordinates on the board.
+        :return: The word, or None if the path holds no word.
+        :raises LookupError: If the path is not covered: it leaves the board
+        or visits a cell twice, or the solve did not record its paths.
+        """
+        if self._path_words is None or not path:
+            raise LookupError("Path is not covered by the recorded paths.")
+        rows, cols = len(self._board), self._cols
+        key = []
+        for row, col in path:
+            if not (0 <= row < rows and 0 <= col < cols):
+                raise LookupError("Path leaves the board.")
+            key.append(row * cols + col)
+        if len(set(key)) != len(key):
+            raise LookupError("Path visits a cell twice.")
+        return self._path_words.get(bytes(key))
+
+    def get_word_cells(self, word: str) -> List[WORD_PATH_TYPE]:
+        """
+        Returns every path of a word recorded by the solve, each as the
+        bitmask of its cells and its cells, in board scanning order.
+        :param word: Word to look for.
+        :return: As described, empty if the word is not on the board.
+        :raises LookupError: If the solve did not record the paths of the
+        words, e.g. for a solution restored from a cache.
+        """
+        if self._word_paths is None:
+            raise LookupError("Paths of the words were not recorded.")
+        return self._word_paths.get(word, [])
+
+    def get_word_paths(self, word: str) -> List[PATH_TYPE]:
+        """
+        Returns every path of a word recorded by the solve, e.g. to replay
+        every way a word can be formed, in board scanning order.
+        :param word: Word to look for.
+        :return: List of paths, empty if the word is not on the board.
+        :raises LookupError: See get_word_cells.
+        """
+        cols = self._cols
+        return [[divmod(cell, cols) for cell in cells]
+                for _, cells in self.get_word_cells(word)]
+
+    def has_all_word_paths(self) -> bool:
+        """
+        Checks if every path of every word was recorded. False when the
+        paths were not recorded, or on path-dense boards where recording
+        stopped at MAX_PATH_WORDS paths.
+        :return: True/False
+        """
+        return self._all_word_paths
+
+    def get_word_score(self, word: str) -> int:
+        """
+        Returns the highest score the word can grant on the board, 0 if the
+        word is not on the board.
+        :param word: Word to look for.
+        :return: As described.
+        """
+        return self._scores.get(word, 0)
+
+    def max_score(self) -> int:
+        """
+        Returns the highest score can be possibly achieved on the board.
+        :return:
+        """
+        return self._max_score
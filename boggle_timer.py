@@ -0,0 +1,229 @@
+"""
+Hierarchical timer wheel.
+Fires the round expirations of many games from one driver: an asyncio task
+(run) or any periodic callback calling advance, such as a Tk after loop.
+Scheduling and cancelling are O(1); every tick only looks at the timers due
+in it, plus a cascade of the next wheel level once per rotation.
+"""
+import asyncio
+import math
+import time
+from typing import Callable, Dict, List, Optional, Union
+
+DEFAULT_RESOLUTION = 0.1  # Seconds per tick.
+DEFAULT_SLOT_BITS = 6  # 64 slots per level.
+DEFAULT_LEVELS = 4  # 64 ** 4 ticks, about 19 days at the default resolution.
+
+
+class TimerHandle:
+    """
+    A scheduled callback, returned by TimerWheel.schedule.
+    """
+    __slots__ = ("deadline", "callback", "_tick", "_done", "_wheel")
+
+    def __init__(self, deadline: float, callback: Callable[[], None],
+                 tick: int, wheel: "TimerWheel"):
+        self.deadline = deadline
+        self.callback = callback
+        self._tick = tick  # The tick the timer is due at.
+        self._done = False  # Fired or cancelled.
+        self._wheel = wheel
+
+    def cancel(self) -> None:
+        """
+        Cancels the timer. Cancelling a fired or cancelled timer does
+        nothing.
+        :return:
+        """
+        if not self._done:
+            self._done = True
+            self._wheel._on_cancel(self)
+
+    def is_pending(self) -> bool:
+        """
+        Checks if the timer is still waiting to fire.
+        :return: True/False
+        """
+        return not self._done
+
+
+class TimerWheel:
+    """
+    Hierarchical timing wheel. Level 0 has one slot per tick; every slot of
+    level k spans a full rotation of level k - 1. A timer is placed on the
+    lowest level whose current rotation contains its due tick and moves down
+    a level (cascades) when the wheel reaches the start of its slot.
+    """
+    _levels: List[List[List[TimerHandle]]]
+    _fired: int  # Callbacks fired.
+    _cancelled: int  # Timers cancelled before firing.
+    _advances: int  # Calls to advance, i.e. driver wakeups.
+    _drift_total: float  # Sum of (fire time - deadline) over fired timers.
+    _drift_max: float  # Largest (fire time - deadline).
+
+    def __init__(self, resolution: float = DEFAULT_RESOLUTION,
+                 slot_bits: int = DEFAULT_SLOT_BITS,
+                 levels: int = DEFAULT_LEVELS,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        :param resolution: Seconds per tick.
+        :param slot_bits: log2 of the number of slots per level.
+        :param levels: Number of levels.
+        :param clock: Monotonic clock deadlines are measured on.
+        """
+        self._resolution = resolution
+        self._bits = slot_bits
+        self._mask = (1 << slot_bits) - 1
+        self._levels = [[[] for _ in range(1 << slot_bits)]
+                        for _ in range(levels)]
+        self._clock = clock
+        self._origin = clock()
+        self._tick = 0  # Last tick processed.
+        self._pending = 0
+        self._fired = 0
+        self._cancelled = 0
+        self._advances = 0
+        self._drift_total = 0.0
+        self._drift_max = 0.0
+
+    def __len__(self) -> int:
+        return self._pending
+
+    def get_clock(self) -> Callable[[], float]:
+        """
+        Getter method for the clock deadlines are measured on.
+        :return:
+        """
+        return self._clock
+
+    def get_resolution(self) -> float:
+        """
+        Getter method for the seconds per tick.
+        :return:
+        """
+        return self._resolution
+
+    def _insert(self, handle: TimerHandle, earliest: int) -> None:
+        """
+        Places a timer in the slot of the lowest level whose current rotation
+        contains its due tick.
+        :param handle: The timer.
+        :param earliest: Earliest tick the timer may be placed at: the next
+        tick for a new timer, the current tick for a cascaded one, whose
+        level 0 slot is processed right after the cascade.
+        :return:
+        """
+        due = max(handle._tick, earliest)
+        for level, slots in enumerate(self._levels):
+            shift = self._bits * (level + 1)
+            if due >> shift == self._tick >> shift:
+                slots[(due >> (self._bits * level)) & self._mask].append(
+                    handle
+                )
+                return
+        raise ValueError("Deadline too far in the future for the wheel.")
+
+    def schedule(self, deadline: float, callback: Callable[[], None]
+                 ) -> TimerHandle:
+        """
+        Schedules a callback to fire once the clock passes a deadline.
+        :param deadline: Clock time to fire at.
+        :param callback: Function to call, it must not raise.
+        :return: Handle to cancel the timer with.
+        """
+        tick = math.ceil((deadline - self._origin) / self._resolution)
+        handle = TimerHandle(deadline, callback, tick, self)
+        self._insert(handle, self._tick + 1)
+        self._pending += 1
+        return handle
+
+    def _on_cancel(self, handle: TimerHandle) -> None:
+        """
+        Accounts for a cancelled timer. It stays in its slot and is dropped
+        when the wheel reaches it.
+        :param handle: The timer.
+        :return:
+        """
+        self._pending -= 1
+        self._cancelled += 1
+
+    def _cascade(self, level: int) -> None:
+        """
+        Moves the timers of the current slot of a level down the wheel.
+        :param level: The level.
+        :return:
+        """
+        index = (self._tick >> (self._bits * level)) & self._mask
+        slot = self._levels[level][index]
+        self._levels[level][index] = []
+        for handle in slot:
+            if not handle._done:
+                self._insert(handle, self._tick)
+
+    def advance(self, now: Optional[float] = None) -> int:
+        """
+        Moves the wheel to the current time, firing the timers whose
+        deadlines passed.
+        :param now: Clock time, defaults to reading the clock.
+        :return: Number of callbacks fired.
+        """
+        if now is None:
+            now = self._clock()
+        self._advances += 1
+        target = math.floor((now - self._origin) / self._resolution)
+        fired = 0
+        while self._tick < target:
+            if not self._pending:
+                # Nothing to fire, no need to visit the empty slots.
+                self._tick = target
+                break
+            self._tick += 1
+            level = 1
+            while (
+                    level < len(self._levels)
+                    and self._tick & ((1 << (self._bits * level)) - 1) == 0
+            ):
+                self._cascade(level)
+                level += 1
+            slot = self._levels[0][self._tick & self._mask]
+            self._levels[0][self._tick & self._mask] = []
+            for handle in slot:
+                if handle._done:
+                    continue
+                handle._done = True
+                self._pending -= 1
+                self._fired += 1
+                fired += 1
+                drift = now - handle.deadline
+                self._drift_total += drift
+                self._drift_max = max(self._drift_max, drift)
+                handle.callback()
+        return fired
+
+    def get_stats(self) -> Dict[str, Union[int, float]]:
+        """
+        Returns the wheel counters: pending timers, fired callbacks,
+        cancelled timers, advances (driver wakeups), and the average and
+        maximal drift (seconds between a deadline and its callback).
+        :return: As described.
+        """
+        return {"pending": self._pending,
+                "fired": self._fired,
+                "cancelled": self._cancelled,
+                "advances": self._advances,
+                "drift_avg": (self._drift_total / self._fired
+                              if self._fired else 0.0),
+                "drift_max": self._drift_max}
+
+    async def run(self) -> None:
+        """
+        Drives the wheel from an asyncio event loop, waking up once per
+        tick, until cancelled.
+        :return:
+        """
+        while True:
+            self.advance()
+            elapsed = self._clock() - self._origin
+            next_tick = (math.floor(elapsed / self._resolution) + 1) \
+                * self._resolution
+            await asyncio.sleep(max(0.0, next_tick - elapsed))
@@ -1,4 +1,10 @@
-from typing import List, Tuple, Optional, Iterable, Union, Set
+import itertools
+import time
+from typing import (
+    List, Tuple, Optional, Iterable, Iterator, Set
+)
+import boggle_metrics
+import boggle_solver
 
 BOARD_TYPE = List[List[str]]
 WORDS_TYPE = Iterable[str]
@@ -49,46 +55,171 @@ def is_valid_path(board: BOARD_TYPE, path: PATH_TYPE,
         return word
 
 
-def _find_length_n_paths_helper(n: int, board: BOARD_TYPE,
-                                words: WORDS_TYPE, start_pos: Tuple[int, int],
-                                length_n_paths: List[PATH_TYPE],
-                                path: PATH_TYPE) -> Optional[List[PATH_TYPE]]:
+def can_extend_path(path: PATH_TYPE, cell: Tuple[int, int]) -> bool:
     """
-    Helper function for find_length_n_paths.
-    :param n: Length of the path.
-    :param board: Boggle 4x4 board.
-    :param words: Word iterable.
-    :param start_pos: Start coordinate of the backtracking.
-    :param length_n_paths: List of the valid paths already found.
-    :param path: The current path the function backtracks.
-    :return: length_n_paths - paths in the length of n that holds valid word.
+    Checks if a cell can be added at the end of a path being built: it is
+    not on the path yet, and it is next to the path's last cell. The cell
+    is not checked to be on the board.
+    :param path: The path built so far.
+    :param cell: The cell to add.
+    :return: True if it can, False otherwise.
     """
-    if len(path) == n:
-        word = is_valid_path(board, path, words)
-        if word is not None:
-            length_n_paths.append(path[:])
-        return
-    row, col = start_pos
-    for dx in range(-1, 2):
-        for dy in range(-1, 2):
-            current_cell = (row + dx, col + dy)
-            if (
-                    row + dx < 0
-                    or row + dx >= len(board)
-                    or col + dy < 0
-                    or col + dy >= len(board[0])
-                    or (dx == 0 and dy == 0)
-            ):
-                pass
-            elif current_cell in path:
-                pass
-            else:
-                path.append(current_cell)
-                _find_length_n_paths_helper(
-                    n, board, words, (row + dx, col + dy), length_n_paths,
-                    path
+    return (
+            cell not in path
+            and (
+                len(path) == 0
+                or (
+                        abs(path[-1][0] - cell[0]) <= 1
+                        and abs(path[-1][1] - cell[1]) <= 1
+                )
+            )
+    )
+
+
+def _walk_words(graph: boggle_solver.BoardGraph,
+                index: boggle_solver.WordIndex, max_cells: Optional[int],
+                max_letters: Optional[int], deadline: Optional[float]
+                ) -> Iterator[Tuple[List[int], str]]:
+    """
+    Walks the board depth first, in the same order as the recursive
+    searches, but without recursion so that every result is yielded as soon
+    as it is found. Paths that are not a prefix of any word are not followed.
+    The index is walked by tile, see boggle_solver.TileIndex.
+    :param graph: Board engine of the board.
+    :param index: Words index.
+    :param max_cells: Longest path to follow, None for no limit.
+    :param max_letters: Longest word to follow, None for no limit.
+    :param deadline: time.monotonic() time to stop at, None to never stop.
+    :return: Iterator of (cells, word) for every path holding a word. The
+    cells list is reused by the walk, copy it to keep it.
+    """
+    letters, neighbours = graph.get_letters(), graph.get_neighbours()
+    tile_index = index.get_tile_index()
+    tiles = tile_index.tile_ids(letters)
+    transitions: boggle_solver.TRANSITIONS_TYPE = {}
+    no_neighbours = ()
+    for start in range(graph.get_size()):
+        word = letters[start]
+        if max_letters is not None and len(word) > max_letters:
+            continue
+        lo, hi, is_word = tile_index.step(0, len(index), "", tiles[start],
+                                          transitions)
+        if lo == hi:
+            continue
+        cells = [start]
+        visited = 1 << start
+        stack = [(iter(no_neighbours if max_cells == 1
+                       else neighbours[start]), word, lo, hi)]
+        if is_word:
+            yield cells, word
+        while stack:
+            if deadline is not None and time.monotonic() >= deadline:
+                return
+            next_cells, word, lo, hi = stack[-1]
+            for next_cell in next_cells:
+                if visited >> next_cell & 1:
+                    continue
+                if max_letters is not None and \
+                        len(word) + len(letters[next_cell]) > max_letters:
+                    continue
+                state = transitions.get(
+                    (lo << 8 | len(word)) << 8 | tiles[next_cell]
                 )
-                path.pop()
+                if state is None:
+                    state = tile_index.step(lo, hi, word, tiles[next_cell],
+                                            transitions)
+                next_lo, next_hi, is_word = state
+                if next_lo == next_hi:
+                    # No word continues this way, prune the branch.
+                    continue
+                next_word = word + letters[next_cell]
+                cells.append(next_cell)
+                visited |= 1 << next_cell
+                stack.append((iter(no_neighbours if len(cells) == max_cells
+                                   else neighbours[next_cell]),
+                              next_word, next_lo, next_hi))
+                if is_word:
+                    yield cells, next_word
+                break
+            else:
+                # Every neighbour was tried, backtrack.
+                stack.pop()
+                visited &= ~(1 << cells.pop())
+
+
+def iter_length_n_paths(n: int, board: BOARD_TYPE, words: WORDS_TYPE,
+                        limit: Optional[int] = None,
+                        deadline: Optional[float] = None
+                        ) -> Iterator[PATH_TYPE]:
+    """
+    Streaming version of find_length_n_paths: yields the paths as the
+    search finds them, in the same order, and can stop early.
+    :param n: Length of path.
+    :param board: Boggle board.
+    :param words: Words list.
+    :param limit: Stops after that many paths, None to find them all.
+    :param deadline: time.monotonic() time to stop searching at, None to
+    search the whole board.
+    :return: Iterator of paths.
+    """
+    if n < 1:
+        return iter(())
+    graph = boggle_solver.BoardGraph(board)
+    walk = _walk_words(graph, boggle_solver.as_word_index(words), n, None,
+                       deadline)
+    paths = (graph.to_path(cells) for cells, _ in walk if len(cells) == n)
+    return itertools.islice(paths, limit)
+
+
+def iter_length_n_words(n: int, board: BOARD_TYPE, words: WORDS_TYPE,
+                        limit: Optional[int] = None,
+                        deadline: Optional[float] = None,
+                        unique: bool = False) -> Iterator[PATH_TYPE]:
+    """
+    Streaming version of find_length_n_words: yields the paths as the
+    search finds them, in the same order, and can stop early.
+    :param n: The length of the words.
+    :param board: Boggle board.
+    :param words: Word iterable.
+    :param limit: Stops after that many paths, None to find them all.
+    :param deadline: time.monotonic() time to stop searching at, None to
+    search the whole board.
+    :param unique: Yields only the first path of every word.
+    :return: Iterator of paths.
+    """
+    graph = boggle_solver.BoardGraph(board)
+    walk = _walk_words(graph, boggle_solver.as_word_index(words), None, n,
+                       deadline)
+    found: Set[str] = set()
+    paths = (graph.to_path(cells) for cells, word in walk
+             if len(word) == n
+             and not (unique and (word in found or found.add(word))))
+    return itertools.islice(paths, limit)
+
+
+def iter_board_words(board: BOARD_TYPE, words: WORDS_TYPE,
+                     limit: Optional[int] = None,
+                     deadline: Optional[float] = None
+                     ) -> Iterator[Tuple[str, PATH_TYPE]]:
+    """
+    Streaming counterpart of max_score_paths: yields every word of the board
+    once, with the first path found for it, as the search finds them. The
+    path is not necessarily the highest score one, which is only known
+    once the whole board is searched.
+    :param board: Boggle board.
+    :param words: Words list.
+    :param limit: Stops after that many words, None to find them all.
+    :param deadline: time.monotonic() time to stop searching at, None to
+    search the whole board.
+    :return: Iterator of (word, path).
+    """
+    graph = boggle_solver.BoardGraph(board)
+    walk = _walk_words(graph, boggle_solver.as_word_index(words), None, None,
+                       deadline)
+    found: Set[str] = set()
+    hits = ((word, graph.to_path(cells)) for cells, word in walk
+            if not (word in found or found.add(word)))
+    return itertools.islice(hits, limit)
 
 
 def find_length_n_paths(n: int, board: BOARD_TYPE, words: WORDS_TYPE
@@ -96,148 +227,75 @@ def find_length_n_paths(n: int, board: BOARD_TYPE, words: WORDS_TYPE
     """
     Returns list of all the legal paths on the board in a given length.
     Legal path is defined in is_valid_path.
+    Paths that are not a prefix of any word are not followed, so passing a
+    prebuilt boggle_solver.WordIndex as words saves indexing the words.
     :param n: Length of path.
     :param board: Boggle 4x4 board.
     :param words: Words list.
     :return: As described.
     """
-    paths_in_length = []
-    for i in range(len(board)):
-        for j in range(len(board[0])):
-            _find_length_n_paths_helper(
-                n, board, words, (i, j), paths_in_length, [(i, j)]
-            )
-    return paths_in_length
-
-
-def _find_length_n_words_helper(n: int, board: BOARD_TYPE,
-                                words: WORDS_TYPE, start_pos: Tuple[int, int],
-                                words_in_length: List[Union[str, PATH_TYPE]],
-                                path: PATH_TYPE,
-                                word: str,
-                                word_append_mode=False
-                                ) -> Optional[Union[List[str], List[PATH_TYPE]]]:
-    """
-    Helper function for find_length_n_words.
-    :param n: Length of each word.
-    :param board: Boggle 4x4 board.
-    :param words: Word iterable.
-    :param start_pos: Start position for the backtracking.
-    :param words_in_length: List of the words / paths already found.
-    :param path: The current path currently backtracked.
-    :param word: The accumulated word.
-    :param word_append_mode: If set to True, the function will append the
-    accumulated words to the return list. Otherwise, it will append the path,
-    as was requested in the exercise.
-    :return: As described in words_append_mode.
-    """
-    if len(word) > n:
-        return
-    if len(word) == n:
-        if is_valid_path(board, path, words) is not None:
-            if word not in words_in_length:
-                if not word_append_mode:
-                    words_in_length.append(path[:])
-                else:
-                    words_in_length.append(word)
-        return
-    row, col = start_pos
-    for dx in range(-1, 2):
-        for dy in range(-1, 2):
-            current_cell = (row + dx, col + dy)
-            if (
-                    row + dx < 0
-                    or row + dx >= len(board)
-                    or col + dy < 0
-                    or col + dy >= len(board[0])
-                    or (dx == 0 and dy == 0)
-            ):
-                pass
-            elif current_cell in path:
-                pass
-            else:
-                path.append(current_cell)
-                word += board[row + dx][col + dy]
-                _find_length_n_words_helper(
-                    n, board, words, (row + dx, col + dy), words_in_length,
-                    path, word, word_append_mode
-                )
-                path.pop()
-                word = word[:-len(board[row + dx][col + dy])]
+    return list(iter_length_n_paths(n, board, words))
 
 
 def find_length_n_words(n: int, board: BOARD_TYPE, words: WORDS_TYPE):
     """
     Returns list of the paths of n-length words on the board that appear in
     the given words iterable.
+    Paths that are not a prefix of any word are not followed, so passing a
+    prebuilt boggle_solver.WordIndex as words saves indexing the words.
     :param n: The length of the words.
     :param board: Boggle 4x4 board.
     :param words: Word iterable.
     :return: As described.
     """
-    words_in_length = []
-    for i in range(len(board)):
-        for j in range(len(board[0])):
-            _find_length_n_words_helper(
-                n, board, words, (i, j), words_in_length, [(i, j)], board[i][j]
-            )
-    return words_in_length
+    return list(iter_length_n_words(n, board, words))
 
 
-def _find_n_length_path_for_word_helper(n: int, board: BOARD_TYPE,
-                                        wished_word: str,
-                                        start_pos: Tuple[int, int],
-                                        word: str,
-                                        path: PATH_TYPE
-                                        ) -> Optional[PATH_TYPE]:
+def _find_n_length_path_for_word_helper(n: int,
+                                        graph: boggle_solver.BoardGraph,
+                                        wished_word: str, cell: int,
+                                        visited: int, depth: int,
+                                        cells: List[int]
+                                        ) -> Optional[List[int]]:
     """
-    Helper function for find_n_length_path_for_word.
+    Helper function for find_n_length_path_for_word. The path is matched
+    against the word in place, tile by tile, without building its letters.
     :param n: Length of the desired path.
-    :param board: Boggle 4x4 board.
+    :param graph: Board engine of the board.
     :param wished_word: The word to look for.
-    :param start_pos: Start position for the backtracking.
-    :param word: Accumulated word.
-    :param path: Accumulated path.
+    :param cell: Last cell of the current path.
+    :param visited: Bitmask of the cells on the current path.
+    :param depth: Number of letters of the word the path matches.
+    :param cells: Accumulated path.
     :return: n-length path to the word if found, None otherwise.
     """
-    if len(path) == n:
-        if word == wished_word:
-            return path
-        return
-    if len(word) > 0 and word != wished_word[:len(word)]:
-        # Stop backtracking, word won't match.
+    if len(cells) == n:
+        if depth == len(wished_word):
+            return cells
         return
-    row, col = start_pos
-    for dx in range(-1, 2):
-        for dy in range(-1, 2):
-            current_cell = (row + dx, col + dy)
-            if (
-                    not(0 <= row + dx < len(board))
-                    or not(0 <= col + dy < len(board[0]))
-                    or (dx == 0 and dy == 0)
-            ):
-                continue
-            elif current_cell in path:
-                continue
-            else:
-                # Add cell to backtracking
-                path.append(current_cell)
-                word += board[row + dx][col + dy]
+    letters = graph.get_letters()
+    for next_cell in graph.get_neighbours()[cell]:
+        if visited >> next_cell & 1:
+            continue
+        tile = letters[next_cell]
+        if not wished_word.startswith(tile, depth):
+            # Stop backtracking, word won't match.
+            continue
+        # Add cell to backtracking
+        cells.append(next_cell)
 
-                # Assume receiving length n path, starting with the current
-                # affix
-                n_len_path = _find_n_length_path_for_word_helper(
-                    n, board, wished_word, (row + dx, col + dy), word,
-                    path
-                )
+        # Assume receiving length n path, starting with the current affix
+        n_len_path = _find_n_length_path_for_word_helper(
+            n, graph, wished_word, next_cell, visited | 1 << next_cell,
+            depth + len(tile), cells
+        )
 
-                # Validate backtracking result
-                if n_len_path is not None:
-                    return n_len_path
+        # Validate backtracking result
+        if n_len_path is not None:
+            return n_len_path
 
-                # Undo backtracking step
-                path.pop()
-                word = word[:-len(board[row + dx][col + dy])]
+        # Undo backtracking step
+        cells.pop()
 
 
 def find_n_length_path_for_word(board: BOARD_TYPE, word: str, n: int
@@ -250,28 +308,16 @@ def find_n_length_path_for_word(board: BOARD_TYPE, word: str, n: int
     :param n: The length of the requested path.
     :return: Path if found, None otherwise.
     """
-    for i in range(len(board)):
-        for j in range(len(board[0])):
-            path = _find_n_length_path_for_word_helper(
-                        n, board, word, (i, j), board[i][j], [(i, j)]
-                    )
-            if path is not None:
-                return path
-
-
-def _max_score_paths_helper(board: BOARD_TYPE, word: str
-                            ) -> Optional[PATH_TYPE]:
-    """
-    Helper function to max_score_paths.
-    :param board: Boggle 4x4 board.
-    :param word: Word to look for in the board.
-    :return: Highest score path in the board for the word if found, None
-    otherwise.
-    """
-    for n in range(len(word), 0, -1):
-        path = find_n_length_path_for_word(board, word, n)
-        if path is not None:
-            return path
+    graph = boggle_solver.BoardGraph(board)
+    letters = graph.get_letters()
+    for cell in range(graph.get_size()):
+        if not word.startswith(letters[cell]):
+            continue
+        cells = _find_n_length_path_for_word_helper(
+            n, graph, word, cell, 1 << cell, len(letters[cell]), [cell]
+        )
+        if cells is not None:
+            return graph.to_path(cells)
 
 
 def max_score_paths(board: BOARD_TYPE, words: WORDS_TYPE) -> List[PATH_TYPE]:
@@ -279,18 +325,17 @@ def max_score_paths(board: BOARD_TYPE, words: WORDS_TYPE) -> List[PATH_TYPE]:
     Returns list of all the paths which are paths of words from the words list
      appear on the board, and granting the highest score for the word they
      represent.
+    The board is walked once against a prefix index of the words (see
+    boggle_solver.solve_board), so passing a prebuilt boggle_solver.WordIndex
+    saves indexing the words on every call.
     :param board: Boggle game board
     :param words: Words list
     :return: List of paths, as described.
     """
-    max_score_paths_list = []
-    for word in words:
-        path = _max_score_paths_helper(board, word)
-        if path is not None:
-            max_score_paths_list.append(path)
-    return max_score_paths_list
+    return list(boggle_solver.solve_board(board, words).values())
 
 
+@boggle_metrics.timed("load_words_list")
 def load_words_list(file: str = "boggle_dict.txt") -> Set[str]:
     """
     Loads words from file.
@@ -0,0 +1,63 @@
+import unittest
+
+import boggle_dict_index
+import boggle_solver
+from boggle_model import BoggleModel
+
+BOARD_A = [["C", "A", "T", "S"],
+           ["O", "R", "E", "D"],
+           ["N", "I", "L", "E"],
+           ["S", "T", "A", "R"]]
+BOARD_B = [["QU", "I", "T", "E"],
+           ["A", "S", "N", "D"],
+           ["R", "O", "E", "L"],
+           ["M", "P", "S", "T"]]
+NO_WORDS_BOARD = [["E"] * 4 for _ in range(4)]
+
+
+def solve(board):
+    return boggle_solver.BoardSolution.solve(board,
+                                             boggle_dict_index.get_index())
+
+
+class MaxScoreInvalidationTest(unittest.TestCase):
+    def setUp(self):
+        self.solution_a = solve(BOARD_A)
+        self.solution_b = solve(BOARD_B)
+        self.model = BoggleModel(BOARD_A, self.solution_a)
+
+    def test_max_score_follows_new_board(self):
+        self.assertEqual(self.model.max_score(),
+                         self.solution_a.max_score())
+        self.model.stop_game(BOARD_B, self.solution_b)
+        self.assertNotEqual(self.solution_a.max_score(),
+                            self.solution_b.max_score())
+        self.assertEqual(self.model.max_score(),
+                         self.solution_b.max_score())
+
+    def test_percentage_follows_new_board(self):
+        self.model.current_score_percentage()
+        self.model.stop_game(BOARD_B, self.solution_b)
+        self.model.start_game()
+        word, path = next(iter(self.solution_b.get_paths().items()))
+        self.assertTrue(self.model.submit_path(path))
+        self.assertEqual(
+            self.model.current_score_percentage(),
+            "{:.2%}".format(len(path) ** 2 / self.solution_b.max_score())
+        )
+
+    def test_zero_word_board(self):
+        self.model.max_score()
+        self.model.stop_game(NO_WORDS_BOARD, solve(NO_WORDS_BOARD))
+        self.assertEqual(self.model.max_score(), 0)
+        self.assertEqual(self.model.current_score_percentage(), "0.00%")
+
+    def test_background_solve_of_new_board(self):
+        self.model.max_score()
+        self.model.stop_game(BOARD_B)
+        self.assertEqual(self.model.max_score(),
+                         self.solution_b.max_score())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+
+from boggle_timer import TimerWheel
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TimerWheelTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.wheel = TimerWheel(resolution=1, clock=self.clock)
+        self.fired = []
+
+    def _schedule(self, deadline: float) -> None:
+        self.wheel.schedule(deadline,
+                            lambda: self.fired.append((deadline,
+                                                       self.clock.now)))
+
+    def _run_until(self, end: int) -> None:
+        for now in range(int(self.clock.now) + 1, end + 1):
+            self.clock.now = now
+            self.wheel.advance()
+
+    def test_fires_on_time_across_level_boundaries(self):
+        deadlines = [1, 63, 64, 65, 127, 128, 129, 4095, 4096, 4097, 8192]
+        for deadline in deadlines:
+            self._schedule(deadline)
+        self._run_until(8200)
+        self.assertEqual(self.fired, [(d, d) for d in deadlines])
+        stats = self.wheel.get_stats()
+        self.assertEqual(stats["drift_max"], 0)
+        self.assertEqual(stats["pending"], 0)
+
+    def test_schedule_after_boundary_passed(self):
+        self._run_until(100)
+        self._schedule(128)
+        self._schedule(4096)
+        self._run_until(5000)
+        self.assertEqual(self.fired, [(128, 128), (4096, 4096)])
+
+    def test_cancelled_timer_does_not_fire(self):
+        handle = self.wheel.schedule(64, lambda: self.fired.append(64))
+        self._schedule(65)
+        handle.cancel()
+        self._run_until(70)
+        self.assertEqual(self.fired, [(65, 65)])
+        self.assertEqual(self.wheel.get_stats()["cancelled"], 1)
+
+    def test_past_deadline_fires_on_next_tick(self):
+        self._run_until(10)
+        self._schedule(3)
+        self._run_until(11)
+        self.assertEqual(self.fired, [(3, 11)])
+
+
+if __name__ == "__main__":
+    unittest.main()